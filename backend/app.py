@@ -1,8 +1,21 @@
 import os
+import re
+import csv
+import gzip
 import json
 import math
+import operator
+import queue
+import threading
+import time
+import atexit
+from bisect import insort, bisect_left, bisect_right
+from collections import deque
 from datetime import datetime, date
-from flask import Flask, jsonify, request
+from functools import lru_cache
+import heapq
+import click
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import mysql.connector
 import statistics
@@ -51,10 +64,338 @@ def parse_date(date_str):
         return None
 
 
+# Shared by the seed step and the ingest buffer. A NULL id lets MySQL assign one.
+INSERT_CLIMATE_SQL = """
+  INSERT INTO climate_data
+    (id, location_id, metric_id, date, value, quality)
+  VALUES (%s, %s, %s, %s, %s, %s)
+  ON DUPLICATE KEY UPDATE
+    location_id=VALUES(location_id),
+    metric_id=VALUES(metric_id),
+    date=VALUES(date),
+    value=VALUES(value),
+    quality=VALUES(quality);
+"""
+
+
+# ─── Partitioning & Archive Tier ─────────────────────────────────────────────
+CLIMATE_PARTITIONING = os.environ.get("CLIMATE_PARTITIONING", "none").lower()  # none | yearly | monthly
+PARTITION_SCHEMES    = ("yearly", "monthly")
+ARCHIVE_DIR          = os.environ.get("ARCHIVE_DIR", os.path.join(BASE_DIR, "data", "archive"))
+ARCHIVE_FILE_RE      = re.compile(r"^climate_data_(\d{4})\.csv\.gz$")
+ARCHIVE_COLUMNS      = ("id", "location_id", "metric_id", "date", "value", "quality")
+ARCHIVE_CACHE_YEARS  = 8
+
+
+def period_start(d):
+    """First day of the partition period containing `d`."""
+    if CLIMATE_PARTITIONING == "monthly":
+        return date(d.year, d.month, 1)
+    return date(d.year, 1, 1)
+
+
+def partition_bounds(start, end):
+    """
+    (name, upper bound) for each partition period from `start` through `end`.
+    A partition holds the dates strictly below its bound.
+    """
+    bounds  = []
+    current = period_start(start)
+    while current <= end:
+        if CLIMATE_PARTITIONING == "monthly":
+            name    = f"p{current.year}_{current.month:02d}"
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            name    = f"p{current.year}"
+            current = date(current.year + 1, 1, 1)
+        bounds.append((name, current))
+    return bounds
+
+
+def climate_data_ddl(first_date):
+    """
+    CREATE TABLE statement for `climate_data`. When partitioned, MySQL needs
+    the partition column in the primary key and does not allow foreign keys,
+    so those are dropped and integrity is left to the seed/ingest validation.
+    An id is then only unique together with its date.
+    """
+    if CLIMATE_PARTITIONING not in PARTITION_SCHEMES:
+        return """
+          CREATE TABLE IF NOT EXISTS climate_data (
+            id           INT               AUTO_INCREMENT PRIMARY KEY,
+            location_id  INT               NOT NULL,
+            metric_id    INT               NOT NULL,
+            date         DATE              NOT NULL,
+            value        FLOAT             NOT NULL,
+            quality      ENUM('excellent','good','questionable','poor') NOT NULL,
+            INDEX idx_series (location_id, metric_id, date),
+            FOREIGN KEY (location_id) REFERENCES locations(id),
+            FOREIGN KEY (metric_id)   REFERENCES metrics(id)
+          );
+        """
+
+    partitions = [f"PARTITION p_old VALUES LESS THAN ('{period_start(first_date)}')"]
+    for name, bound in partition_bounds(first_date, first_date):
+        partitions.append(f"PARTITION {name} VALUES LESS THAN ('{bound}')")
+    partitions.append("PARTITION p_max VALUES LESS THAN (MAXVALUE)")
+    partition_sql = ",\n        ".join(partitions)
+
+    return f"""
+      CREATE TABLE IF NOT EXISTS climate_data (
+        id           INT               AUTO_INCREMENT,
+        location_id  INT               NOT NULL,
+        metric_id    INT               NOT NULL,
+        date         DATE              NOT NULL,
+        value        FLOAT             NOT NULL,
+        quality      ENUM('excellent','good','questionable','poor') NOT NULL,
+        PRIMARY KEY (id, date),
+        INDEX idx_series (location_id, metric_id, date)
+      )
+      PARTITION BY RANGE COLUMNS(date) (
+        {partition_sql}
+      );
+    """
+
+
+def ensure_partitions(cursor, through):
+    """Split `p_max` so named partitions exist through `through`. No-op when unpartitioned."""
+    if CLIMATE_PARTITIONING not in PARTITION_SCHEMES:
+        return
+
+    cursor.execute("""
+      SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+      FROM information_schema.PARTITIONS
+      WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'climate_data'
+        AND PARTITION_NAME IS NOT NULL;
+    """)
+    existing = dict(cursor.fetchall())
+    if "p_max" not in existing:
+        print("⚠️  climate_data already exists without partitions; "
+              "recreate it to enable CLIMATE_PARTITIONING.")
+        return
+
+    # Highest bound below MAXVALUE, e.g. "'2026-01-01'"
+    last_bound = max(
+        parse_date(desc.strip("'")) for name, desc in existing.items() if name != "p_max"
+    )
+    missing = partition_bounds(last_bound, through)
+    if not missing:
+        return
+
+    parts = [f"PARTITION {name} VALUES LESS THAN ('{bound}')" for name, bound in missing]
+    parts.append("PARTITION p_max VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(f"ALTER TABLE climate_data REORGANIZE PARTITION p_max INTO ({', '.join(parts)});")
+
+
+def partitions_for_year(cursor, year):
+    """
+    Names of the partitions that hold exactly `year`, or None when the table
+    is unpartitioned or the year shares a partition (e.g. p_old) with others.
+    """
+    if CLIMATE_PARTITIONING not in PARTITION_SCHEMES:
+        return None
+
+    cursor.execute("""
+      SELECT PARTITION_NAME
+      FROM information_schema.PARTITIONS
+      WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'climate_data'
+        AND PARTITION_NAME IS NOT NULL;
+    """)
+    existing = {row[0] for row in cursor.fetchall()}
+    names    = [name for name, _ in partition_bounds(date(year, 1, 1), date(year, 12, 31))]
+    if not existing.issuperset(names):
+        return None
+    return names
+
+
+def archive_path(year):
+    return os.path.join(ARCHIVE_DIR, f"climate_data_{year}.csv.gz")
+
+
+def archived_years():
+    """Years that have an archive file, ascending."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    years = []
+    for name in os.listdir(ARCHIVE_DIR):
+        match = ARCHIVE_FILE_RE.match(name)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+
+@lru_cache(maxsize=ARCHIVE_CACHE_YEARS)
+def _read_archive_file(path, mtime):
+    """Parse one archive file. `mtime` is only there to invalidate the cache on rewrite."""
+    with gzip.open(path, "rt", newline="") as f:
+        return tuple(
+            (
+                int(r["id"]),
+                int(r["location_id"]),
+                int(r["metric_id"]),
+                parse_date(r["date"]),
+                float(r["value"]),
+                r["quality"],
+            )
+            for r in csv.DictReader(f)
+        )
+
+
+def load_archived_rows(start_date=None, end_date=None):
+    """
+    Archived (id, location_id, metric_id, date, value, quality) tuples in the
+    date range. Only the files for overlapping years are opened.
+    """
+    rows = []
+    for year in archived_years():
+        if (start_date and year < start_date.year) or (end_date and year > end_date.year):
+            continue
+        path = archive_path(year)
+        for row in _read_archive_file(path, os.path.getmtime(path)):
+            if (start_date and row[3] < start_date) or (end_date and row[3] > end_date):
+                continue
+            rows.append(row)
+    return rows
+
+
+def read_archived_rows(start_date=None, end_date=None, location_id=None, metric_id=None,
+                       location_name=None, metric_name=None, location_ids=None):
+    """
+    Archived rows matching the endpoint filters, as dicts carrying the
+    location/metric columns and unit that the live queries join in. Rows for
+    locations or metrics that no longer exist are skipped.
+    """
+    rows = load_archived_rows(start_date, end_date)
+    if not rows:
+        return []
+
+    conn   = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, name, region, country FROM locations;")
+    locations = {r["id"]: r for r in cursor.fetchall()}
+    cursor.execute("SELECT id, name, unit FROM metrics;")
+    metrics = {r["id"]: r for r in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+
+    result = []
+    for row_id, loc_id, met_id, dt, value, quality in rows:
+        if loc_id not in locations or met_id not in metrics:
+            continue
+        if location_id and loc_id != location_id:
+            continue
+        if location_ids is not None and loc_id not in location_ids:
+            continue
+        if metric_id and met_id != metric_id:
+            continue
+        # Names compare like the live `l.name = %s` under MySQL's case-insensitive collation
+        if location_name and locations[loc_id]["name"].lower() != location_name.lower():
+            continue
+        if metric_name and metrics[met_id]["name"].lower() != metric_name.lower():
+            continue
+        result.append({
+            "id":            row_id,
+            "location_id":   loc_id,
+            "location_name": locations[loc_id]["name"],
+            "region":        locations[loc_id]["region"],
+            "country":       locations[loc_id]["country"],
+            "metric_id":     met_id,
+            "metric_name":   metrics[met_id]["name"],
+            "unit":          metrics[met_id]["unit"],
+            "date":          dt,
+            "value":         value,
+            "quality":       quality
+        })
+    return result
+
+
+def archive_year(year):
+    """
+    Move every `climate_data` row dated in `year` into the archive tier.
+
+    The file (merged with any earlier archive of that year) is written
+    before rows are deleted, so an interrupted run leaves duplicates rather
+    than gaps; re-running it finishes the move. Rows are keyed by (id, date),
+    which is the primary key when partitioned. Returns rows moved.
+
+    When the year has its own partitions they are truncated instead of
+    deleting row by row, so nothing should write readings for that year
+    while this runs.
+    """
+    if year >= date.today().year:
+        raise ValueError(f"{year} is not a closed year")
+
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    conn   = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+      SELECT id, location_id, metric_id, date, value, quality
+      FROM climate_data
+      WHERE date >= %s AND date < %s;
+    """, (start, end))
+    moved = cursor.fetchall()
+
+    path   = archive_path(year)
+    merged = {}
+    if os.path.exists(path):
+        for row in _read_archive_file(path, os.path.getmtime(path)):
+            merged[(row[0], row[3])] = row
+    for row_id, loc_id, met_id, dt, value, quality in moved:
+        merged[(row_id, dt)] = (row_id, loc_id, met_id, dt, float(value), quality)
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for row in sorted(merged.values(), key=lambda r: (r[1], r[2], r[3], r[0])):
+            writer.writerow((row[0], row[1], row[2], row[3].strftime("%Y-%m-%d"), row[4], row[5]))
+    os.replace(tmp_path, path)
+
+    year_partitions = partitions_for_year(cursor, year)
+    if year_partitions:
+        cursor.execute(f"ALTER TABLE climate_data TRUNCATE PARTITION {', '.join(year_partitions)};")
+    else:
+        # Delete exactly the rows that were archived
+        ids = [row[0] for row in moved]
+        for i in range(0, len(ids), 1000):
+            chunk = ids[i:i + 1000]
+            cursor.execute(
+                "DELETE FROM climate_data WHERE date >= %s AND date < %s AND id IN ("
+                + ", ".join(["%s"] * len(chunk)) + ");",
+                (start, end, *chunk)
+            )
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return len(moved)
+
+
+@app.cli.command("archive-year")
+@click.argument("year", type=int)
+def archive_year_command(year):
+    """Move climate_data rows from YEAR into the compressed archive tier."""
+    try:
+        count = archive_year(year)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="YEAR")
+    print(f"✅ Archived {count} rows from {year} to {archive_path(year)}.")
+
+
 def init_db():
     """
     Create tables if they do not exist, then seed from sample_data.json.
     """
+    # Partitions start from the earliest sample reading
+    with open(DATA_PATH, "r") as f:
+        raw = json.load(f)
+    first_date = min(
+        (parse_date(e["date"]) for e in raw.get("climate_data", [])),
+        default=date.today()
+    )
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -81,24 +422,40 @@ def init_db():
       );
     """)
 
-    # 3) Create `climate_data` table
+    # 3) Create `climate_data` table (range-partitioned by date if configured)
+    cursor.execute(climate_data_ddl(first_date))
+    ensure_partitions(cursor, date(date.today().year + 1, 12, 31))
+
+    # Tables created before /ingest existed have a plain INT id; readings
+    # posted without an id need it to auto-increment.
     cursor.execute("""
-      CREATE TABLE IF NOT EXISTS climate_data (
-        id           INT               PRIMARY KEY,
+      SELECT EXTRA FROM information_schema.COLUMNS
+      WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME   = 'climate_data'
+        AND COLUMN_NAME  = 'id'
+    """)
+    id_column = cursor.fetchone()
+    if id_column is not None and "auto_increment" not in (id_column[0] or "").lower():
+        cursor.execute("ALTER TABLE climate_data MODIFY id INT NOT NULL AUTO_INCREMENT")
+
+    # 4) Create `climate_anomalies` table (anomaly index, rebuilt from climate_data)
+    cursor.execute("""
+      CREATE TABLE IF NOT EXISTS climate_anomalies (
+        id           INT               AUTO_INCREMENT PRIMARY KEY,
         location_id  INT               NOT NULL,
         metric_id    INT               NOT NULL,
+        method       ENUM('rolling','seasonal') NOT NULL,
         date         DATE              NOT NULL,
         value        FLOAT             NOT NULL,
         quality      ENUM('excellent','good','questionable','poor') NOT NULL,
+        baseline     FLOAT             NOT NULL,
+        deviation    FLOAT             NOT NULL,
+        INDEX idx_series (location_id, metric_id, method, date),
         FOREIGN KEY (location_id) REFERENCES locations(id),
         FOREIGN KEY (metric_id)   REFERENCES metrics(id)
       );
     """)
 
-    # 4) Load sample_data.json
-    with open(DATA_PATH, "r") as f:
-        raw = json.load(f)
-
     # 5) Seed `locations`
     insert_loc = """
       INSERT INTO locations 
@@ -141,21 +498,13 @@ def init_db():
             met.get("description", None),
         ))
 
-    # 7) Seed `climate_data`
-    insert_cd = """
-      INSERT INTO climate_data
-        (id, location_id, metric_id, date, value, quality)
-      VALUES (%s, %s, %s, %s, %s, %s)
-      ON DUPLICATE KEY UPDATE
-        location_id=VALUES(location_id),
-        metric_id=VALUES(metric_id),
-        date=VALUES(date),
-        value=VALUES(value),
-        quality=VALUES(quality);
-    """
+    # 7) Seed `climate_data`, except years already moved to the archive tier
+    skip_years = set(archived_years())
     for entry in raw.get("climate_data", []):
         dt = parse_date(entry["date"])
-        cursor.execute(insert_cd, (
+        if dt.year in skip_years:
+            continue
+        cursor.execute(INSERT_CLIMATE_SQL, (
             entry["id"],
             entry["location_id"],
             entry["metric_id"],
@@ -167,9 +516,1028 @@ def init_db():
     conn.commit()
     cursor.close()
     conn.close()
+
+    # 8) Rebuild the anomaly index and reload the location index from the seeded rows
+    anomaly_index.rebuild()
+    location_index.invalidate()
     print("✅ Database created and sample_data seeded.")
 
 
+# ─── Anomaly Detection ────────────────────────────────────────────────────────
+ANOMALY_METHODS     = ("global", "seasonal", "rolling")
+ANOMALY_WINDOW      = int(os.environ.get("ANOMALY_WINDOW", 30))
+ANOMALY_MIN_PERIODS = int(os.environ.get("ANOMALY_MIN_PERIODS", 5))
+ANOMALY_THRESHOLD   = float(os.environ.get("ANOMALY_THRESHOLD", 3.5))
+MAD_SCALE           = 0.6745  # scales MAD to a normal stdev (Iglewicz & Hoaglin)
+
+INSERT_ANOMALY_SQL = """
+  INSERT INTO climate_anomalies
+    (location_id, metric_id, method, date, value, quality, baseline, deviation)
+  VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+"""
+
+
+class RollingWindow:
+    """Trailing window of the last `size` values, kept sorted for cheap medians."""
+
+    def __init__(self, size):
+        self.size     = size
+        self._recent  = deque()  # arrival order, for eviction
+        self._ordered = []       # same values, sorted
+
+    def __len__(self):
+        return len(self._recent)
+
+    def add(self, value):
+        self._recent.append(value)
+        insort(self._ordered, value)
+        if len(self._recent) > self.size:
+            self._ordered.pop(bisect_left(self._ordered, self._recent.popleft()))
+
+    def median(self):
+        n = len(self._ordered)
+        return (self._ordered[(n - 1) // 2] + self._ordered[n // 2]) / 2
+
+    def mad(self, median):
+        return statistics.median(abs(v - median) for v in self._ordered)
+
+
+class RobustBaseline:
+    """
+    Streaming median/MAD baseline for one (location, metric) series.
+
+    Each reading is scored against the trailing `window` readings before it
+    and then added, so a series is handled in one pass and new readings can
+    be appended without a rescan. `rolling` scores raw values. `seasonal`
+    first subtracts the median of recent readings from the same calendar
+    month and scores the residual, so a warm summer is not an anomaly; until
+    a month has `min_periods` readings it is scored like `rolling`.
+    """
+
+    def __init__(self, method, window=ANOMALY_WINDOW,
+                 min_periods=ANOMALY_MIN_PERIODS, threshold=ANOMALY_THRESHOLD):
+        self.method      = method
+        self.window      = window
+        self.min_periods = min_periods
+        self.threshold   = threshold
+        self.last_date   = None
+        self._values     = RollingWindow(window)  # raw values, or residuals when seasonal
+        self._raw        = RollingWindow(window)  # raw values, seasonal fallback only
+        self._months     = {}                     # month -> RollingWindow of raw values
+
+    def score(self, dt, value):
+        """
+        Score `value` against the current baseline, then add it to the window.
+        Returns (baseline, deviation) if the reading is anomalous, else None.
+        """
+        self.last_date = dt
+        if self.method != "seasonal":
+            result = self._check(self._values, value, 0.0)
+            self._values.add(value)
+            return result
+
+        month = self._months.setdefault(dt.month, RollingWindow(self.window))
+        if len(month) >= self.min_periods:
+            offset = month.median()
+            result = self._check(self._values, value - offset, offset)
+            self._values.add(value - offset)
+        else:
+            # No same-month history yet (e.g. the first year of a series)
+            result = self._check(self._raw, value, 0.0)
+        month.add(value)
+        self._raw.add(value)
+        return result
+
+    def _check(self, window, target, offset):
+        if len(window) < self.min_periods:
+            return None
+        median = window.median()
+        mad    = window.mad(median)
+        # A flat window (MAD 0, e.g. a dry spell) gives no usable scale; skip it
+        if mad == 0:
+            return None
+        deviation = MAD_SCALE * (target - median) / mad
+        if abs(deviation) > self.threshold:
+            return (offset + median, deviation)
+        return None
+
+
+class AnomalyIndex:
+    """
+    Anomalies per (location, metric, method), persisted in `climate_anomalies`.
+
+    The RobustBaseline of every series stays in memory, so flushed readings
+    that arrive in date order are scored incrementally. Late readings,
+    explicit ids (which may overwrite a stored reading) and series not seen
+    since startup trigger a rebuild of just the affected series. So do
+    series whose anomalies could not be written last time (see `_stale`).
+    """
+
+    INDEXED_METHODS = ("rolling", "seasonal")
+
+    def __init__(self):
+        self._baselines = {}     # (location_id, metric_id, method) -> RobustBaseline
+        self._stale     = set()  # (location_id, metric_id) to rebuild on the next update
+        self._lock      = threading.RLock()
+
+    def rebuild(self, series=None):
+        """Rescan climate_data for every series (or only `series` pairs) and rewrite its anomalies."""
+        where  = "1=1"
+        params = []
+        if series:
+            where = "(location_id, metric_id) IN (" + ", ".join(["(%s, %s)"] * len(series)) + ")"
+            for loc_id, metric_id in series:
+                params.extend((loc_id, metric_id))
+
+        with self._lock:
+            conn   = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+              SELECT location_id, metric_id, date, id, value, quality
+              FROM climate_data
+              WHERE {where}
+              ORDER BY location_id, metric_id, date, id;
+            """, tuple(params))
+
+            # Archived years come first in each series, so the baselines see full history
+            wanted   = set(series) if series else None
+            archived = sorted(
+                (loc_id, metric_id, dt, row_id, value, quality)
+                for row_id, loc_id, metric_id, dt, value, quality in load_archived_rows()
+                if wanted is None or (loc_id, metric_id) in wanted
+            )
+
+            baselines = {}
+            found     = []
+            for loc_id, metric_id, dt, _id, value, quality in heapq.merge(archived, cursor):
+                for method in self.INDEXED_METHODS:
+                    key = (loc_id, metric_id, method)
+                    if key not in baselines:
+                        baselines[key] = RobustBaseline(method)
+                    hit = baselines[key].score(dt, value)
+                    if hit:
+                        found.append((loc_id, metric_id, method, dt, value, quality, hit[0], hit[1]))
+
+            cursor.execute(f"DELETE FROM climate_anomalies WHERE {where};", tuple(params))
+            if found:
+                cursor.executemany(INSERT_ANOMALY_SQL, found)
+            conn.commit()
+            cursor.close()
+            conn.close()
+
+            if series is None:
+                self._baselines = baselines
+                self._stale.clear()
+            else:
+                self._baselines = {
+                    k: v for k, v in self._baselines.items() if (k[0], k[1]) not in wanted
+                }
+                self._baselines.update(baselines)
+                self._stale -= wanted
+            return len(found)
+
+    def update(self, rows):
+        """Score freshly flushed climate_data rows and store any new anomalies."""
+        by_series = {}
+        for row_id, loc_id, metric_id, dt, value, quality in rows:
+            by_series.setdefault((loc_id, metric_id), []).append((row_id, dt, value, quality))
+
+        with self._lock:
+            stale = set(self._stale)
+            found = []
+            for (loc_id, metric_id), readings in by_series.items():
+                readings.sort(key=lambda r: r[1])
+                baselines = [self._baselines.get((loc_id, metric_id, m)) for m in self.INDEXED_METHODS]
+                if (loc_id, metric_id) in stale \
+                        or any(b is None for b in baselines) \
+                        or any(r[0] is not None for r in readings) \
+                        or readings[0][1] < baselines[0].last_date:
+                    stale.add((loc_id, metric_id))
+                    continue
+                for b in baselines:
+                    for _id, dt, value, quality in readings:
+                        hit = b.score(dt, value)
+                        if hit:
+                            found.append((loc_id, metric_id, b.method, dt, value, quality, hit[0], hit[1]))
+
+            try:
+                if found:
+                    conn   = get_db_connection()
+                    cursor = conn.cursor()
+                    cursor.executemany(INSERT_ANOMALY_SQL, found)
+                    conn.commit()
+                    cursor.close()
+                    conn.close()
+                if stale:
+                    self.rebuild(sorted(stale))
+            except Exception:
+                # The in-memory baselines are already past these readings, so the
+                # stored anomalies are incomplete; drop the baselines and rebuild later
+                self._mark_stale(stale | {(f[0], f[1]) for f in found})
+                raise
+
+    def _mark_stale(self, series):
+        self._stale |= series
+        self._baselines = {
+            k: v for k, v in self._baselines.items() if (k[0], k[1]) not in series
+        }
+
+
+def fetch_indexed_anomalies(method, loc_name=None, metric_name=None, start_date=None, end_date=None,
+                            location_ids=None):
+    """Read indexed anomalies for the given filters, grouped by metric name."""
+    sql = """
+      SELECT
+        m.name AS metric_name,
+        l.name AS location_name,
+        DATE_FORMAT(a.date, '%Y-%m-%d') AS date,
+        a.value,
+        a.quality,
+        a.baseline,
+        a.deviation
+      FROM climate_anomalies a
+      JOIN locations l ON a.location_id = l.id
+      JOIN metrics m   ON a.metric_id   = m.id
+      WHERE a.method = %s
+    """
+    params = [method]
+
+    if loc_name:
+        sql += " AND l.name = %s"
+        params.append(loc_name)
+
+    if metric_name:
+        sql += " AND m.name = %s"
+        params.append(metric_name)
+
+    if location_ids is not None:
+        clause, ids = location_ids_clause("a.location_id", location_ids)
+        sql += f" AND {clause}"
+        params.extend(ids)
+
+    if start_date:
+        sql += " AND a.date >= %s"
+        params.append(start_date)
+
+    if end_date:
+        sql += " AND a.date <= %s"
+        params.append(end_date)
+
+    sql += " ORDER BY a.date, l.name"
+
+    conn   = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql, tuple(params))
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(r["metric_name"], []).append(r)
+    return grouped
+
+
+anomaly_index = AnomalyIndex()
+
+
+# ─── Real-time Ingest ─────────────────────────────────────────────────────────
+INGEST_FLUSH_SIZE     = int(os.environ.get("INGEST_FLUSH_SIZE", 500))
+INGEST_FLUSH_INTERVAL = float(os.environ.get("INGEST_FLUSH_INTERVAL", 2.0))
+INGEST_MAX_BATCH      = int(os.environ.get("INGEST_MAX_BATCH", 5000))
+INGEST_MAX_PENDING    = int(os.environ.get("INGEST_MAX_PENDING", 50000))
+INGEST_DEAD_LETTERS   = 1000   # rejected rows kept for inspection
+SSE_KEEPALIVE_SECONDS = 15
+SSE_QUEUE_SIZE        = 100
+
+# Column ranges MySQL enforces on climate_data
+MYSQL_INT_MAX   = 2**31 - 1
+MYSQL_FLOAT_MAX = 3.402823466e38
+MYSQL_DATE_MIN  = date(1000, 1, 1)
+
+
+class EventBroker:
+    """
+    Fan out server-sent events to every connected /stream subscriber.
+    Each subscriber owns a bounded queue; a client that falls behind
+    drops messages instead of blocking the publisher.
+    """
+
+    def __init__(self, queue_size=SSE_QUEUE_SIZE):
+        self._queue_size  = queue_size
+        self._subscribers = set()
+        self._lock        = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event, payload):
+        message = f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+class IngestBufferFull(Exception):
+    """Raised by IngestBuffer.add when accepting rows would exceed `max_pending`."""
+
+
+class IngestBuffer:
+    """
+    Hold validated readings in memory and write them to `climate_data`
+    in one transaction once `flush_size` rows are pending or the oldest
+    pending row is `flush_interval` seconds old.
+
+    If MySQL rejects the data itself (DataError / IntegrityError), the batch
+    is bisected so the good rows are still committed and each bad row goes
+    to `dead_letters`. Any other failure (e.g. the server is down) puts the
+    batch back for the next flush; `max_pending` bounds how much can pile up.
+    """
+
+    def __init__(self, flush_size, flush_interval, on_flush=None,
+                 max_pending=INGEST_MAX_PENDING, max_dead_letters=INGEST_DEAD_LETTERS):
+        self.flush_size     = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending    = max_pending
+        self.dead_letters   = deque(maxlen=max_dead_letters)  # {"row": ..., "error": ...}
+        self._on_flush      = on_flush
+        self._rows          = []
+        self._oldest        = None               # monotonic time of first pending row
+        self._lock          = threading.Lock()   # guards _rows / _oldest
+        self._flush_lock    = threading.Lock()   # serialises group commits
+        self._wake          = threading.Event()  # tells the worker a new batch started
+        self._worker        = None
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+
+    def add(self, rows):
+        """
+        Queue rows for the next group commit; returns the pending count.
+        Raises IngestBufferFull, without buffering anything, when the rows
+        would not fit under `max_pending`.
+        """
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_pending:
+                raise IngestBufferFull(f"{len(self._rows)} readings already pending")
+            started = not self._rows
+            if started:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            pending = len(self._rows)
+        self._ensure_worker()
+        if started:
+            self._wake.set()
+        if pending >= self.flush_size:
+            self.flush()
+            return self.pending()
+        return pending
+
+    def flush(self):
+        """Write every pending row in a single transaction; returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+            if not rows:
+                return 0
+
+            try:
+                conn = get_db_connection()
+            except Exception:
+                self._requeue(rows)
+                raise
+            cursor   = conn.cursor()
+            written  = []
+            rejected = []
+            error    = None
+            try:
+                self._write(conn, cursor, rows, written, rejected)
+            except Exception as exc:
+                # Not a problem with the rows themselves; the next flush retries them.
+                # Halves are written in order, so what is already committed or
+                # dead-lettered is a prefix of the batch and must not go back.
+                self._requeue(rows[len(written) + len(rejected):])
+                error = exc
+            finally:
+                cursor.close()
+                conn.close()
+
+        if written and self._on_flush:
+            self._on_flush(written)
+        if error is not None:
+            raise error
+        return len(written)
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._rows[:0] = rows
+            self._oldest = time.monotonic()
+
+    def _write(self, conn, cursor, rows, written, rejected):
+        """
+        Commit `rows`, bisecting on data errors. Committed rows are appended to
+        `written` and refused ones to `rejected` as soon as that is final.
+        """
+        try:
+            cursor.executemany(INSERT_CLIMATE_SQL, rows)
+            conn.commit()
+            written.extend(rows)
+        except (mysql.connector.errors.DataError, mysql.connector.errors.IntegrityError) as exc:
+            conn.rollback()
+            if len(rows) == 1:
+                app.logger.warning("Ingest row rejected: %s (%s)", rows[0], exc)
+                self.dead_letters.append({"row": rows[0], "error": str(exc)})
+                rejected.append(rows[0])
+                return
+            mid = len(rows) // 2
+            self._write(conn, cursor, rows[:mid], written, rejected)
+            self._write(conn, cursor, rows[mid:], written, rejected)
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, name="ingest-flush", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                oldest = self._oldest
+            timeout = self.flush_interval
+            if oldest is not None:
+                timeout = max(0.0, oldest + self.flush_interval - time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+            with self._lock:
+                due = self._oldest is not None and \
+                    time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as exc:
+                    app.logger.error("Ingest flush failed: %s", exc)
+
+
+def summarize_flushed_rows(rows):
+    """Collapse flushed rows into one entry per (location, metric) series."""
+    series = {}
+    for _id, loc_id, metric_id, dt, _value, _quality in rows:
+        entry = series.get((loc_id, metric_id))
+        if entry is None:
+            series[(loc_id, metric_id)] = {
+                "location_id": loc_id,
+                "metric_id":   metric_id,
+                "start_date":  dt,
+                "end_date":    dt,
+                "count":       1
+            }
+            continue
+        entry["start_date"] = min(entry["start_date"], dt)
+        entry["end_date"]   = max(entry["end_date"], dt)
+        entry["count"]     += 1
+
+    for entry in series.values():
+        entry["start_date"] = entry["start_date"].strftime("%Y-%m-%d")
+        entry["end_date"]   = entry["end_date"].strftime("%Y-%m-%d")
+    return list(series.values())
+
+
+def on_ingest_flush(rows):
+    """Bring the anomaly index up to date, then tell subscribers which series changed."""
+    try:
+        anomaly_index.update(rows)
+    except mysql.connector.Error as exc:
+        app.logger.error("Anomaly index update failed: %s", exc)
+    event_broker.publish("climate_data", {
+        "count":  len(rows),
+        "series": summarize_flushed_rows(rows)
+    })
+
+
+def validate_reading(entry, location_ids, metric_ids):
+    """
+    Turn one ingest payload entry into an INSERT_CLIMATE_SQL row tuple.
+    Returns (row, None) on success or (None, error message) on failure.
+    """
+    if not isinstance(entry, dict):
+        return None, "reading must be an object"
+
+    row_id = entry.get("id")
+    if row_id is not None and (not isinstance(row_id, int) or isinstance(row_id, bool)
+                               or not 1 <= row_id <= MYSQL_INT_MAX):
+        return None, f"id must be an integer between 1 and {MYSQL_INT_MAX}"
+    if row_id is not None and CLIMATE_PARTITIONING in PARTITION_SCHEMES:
+        # The key is (id, date), so an id would not replace a reading on another date
+        return None, "id cannot be given while climate_data is partitioned"
+
+    loc_id = entry.get("location_id")
+    if not isinstance(loc_id, int) or isinstance(loc_id, bool) or loc_id not in location_ids:
+        return None, "location_id must be the id of an existing location"
+
+    metric_id = entry.get("metric_id")
+    if not isinstance(metric_id, int) or isinstance(metric_id, bool) or metric_id not in metric_ids:
+        return None, "metric_id must be the id of an existing metric"
+
+    dt = parse_date(entry.get("date")) if isinstance(entry.get("date"), str) else None
+    if dt is None:
+        return None, "date must use the format YYYY-MM-DD"
+    if dt < MYSQL_DATE_MIN:
+        return None, "date must not be before 1000-01-01"
+
+    value = entry.get("value")
+    if not isinstance(value, (int, float)) or isinstance(value, bool) \
+            or not math.isfinite(value) or abs(value) > MYSQL_FLOAT_MAX:
+        return None, f"value must be a finite number within ±{MYSQL_FLOAT_MAX:g}"
+
+    quality = entry.get("quality")
+    quality = quality.lower() if isinstance(quality, str) else None
+    if quality not in QUALITY_WEIGHTS:
+        return None, "quality must be one of: excellent, good, questionable, poor"
+
+    return (row_id, loc_id, metric_id, dt, float(value), quality), None
+
+
+event_broker  = EventBroker()
+ingest_buffer = IngestBuffer(INGEST_FLUSH_SIZE, INGEST_FLUSH_INTERVAL, on_flush=on_ingest_flush)
+
+
+@atexit.register
+def _flush_ingest_on_exit():
+    try:
+        ingest_buffer.flush()
+    except Exception as exc:
+        print(f"⚠️  Could not flush {ingest_buffer.pending()} buffered readings: {exc}")
+
+
+# ─── Location Index ───────────────────────────────────────────────────────────
+EARTH_RADIUS_KM = 6371.0088
+SUMMARY_GROUPS  = {  # /summary group_by value -> locations column
+    "location": "name",
+    "region":   "region",
+    "country":  "country"
+}
+
+
+def to_unit_vector(lat, lon):
+    """Point on the unit sphere for a latitude/longitude in degrees."""
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord):
+    """Great-circle distance in km for a straight-line distance between unit vectors."""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class LocationIndex:
+    """
+    In-memory spatial index over the `locations` catalog, loaded on first use.
+
+    A k-d tree over unit-sphere vectors answers nearest-neighbour and radius
+    queries; chord length orders like great-circle distance, so there is no
+    special case at the antimeridian or poles. Bounding boxes use a list
+    sorted by latitude. Region and country lookups use the same snapshot.
+    """
+
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self._loaded    = False
+        self.locations  = {}  # id -> location row
+        self._tree      = None
+        self._by_lat    = []  # (latitude, id), sorted
+        self._lats      = []  # latitudes alone, for bisect
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded:
+                return
+            conn   = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, name, country, latitude, longitude, region FROM locations;")
+            rows = cursor.fetchall()
+            cursor.close()
+            conn.close()
+
+            for r in rows:
+                r["latitude"]  = float(r["latitude"])
+                r["longitude"] = float(r["longitude"])
+            self.locations = {r["id"]: r for r in rows}
+            points         = [(to_unit_vector(r["latitude"], r["longitude"]), r["id"]) for r in rows]
+            self._tree     = self._build(points, 0)
+            self._by_lat   = sorted((r["latitude"], r["id"]) for r in rows)
+            self._lats     = [lat for lat, _ in self._by_lat]
+            self._loaded   = True
+
+    def _build(self, points, depth):
+        # Node: (vector, location id, split axis, left, right)
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        return (
+            points[mid][0],
+            points[mid][1],
+            axis,
+            self._build(points[:mid], depth + 1),
+            self._build(points[mid + 1:], depth + 1)
+        )
+
+    def nearest(self, lat, lon, k=1):
+        """The `k` closest locations as (location, distance_km), nearest first."""
+        self._ensure_loaded()
+        target = to_unit_vector(lat, lon)
+        best   = []  # max-heap of (-chord, id)
+
+        def visit(node):
+            if node is None:
+                return
+            vec, loc_id, axis, left, right = node
+            dist = math.dist(vec, target)
+            if len(best) < k:
+                heapq.heappush(best, (-dist, loc_id))
+            elif dist < -best[0][0]:
+                heapq.heapreplace(best, (-dist, loc_id))
+            diff = target[axis] - vec[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or abs(diff) < -best[0][0]:
+                visit(far)
+
+        visit(self._tree)
+        return [
+            (self.locations[loc_id], chord_to_km(-neg))
+            for neg, loc_id in sorted(best, reverse=True)
+        ]
+
+    def within_radius(self, lat, lon, radius_km):
+        """Locations within `radius_km` as (location, distance_km), nearest first."""
+        self._ensure_loaded()
+        target = to_unit_vector(lat, lon)
+        limit  = km_to_chord(radius_km)
+        found  = []
+
+        def visit(node):
+            if node is None:
+                return
+            vec, loc_id, axis, left, right = node
+            dist = math.dist(vec, target)
+            if dist <= limit:
+                found.append((dist, loc_id))
+            diff = target[axis] - vec[axis]
+            if diff - limit <= 0:
+                visit(left)
+            if diff + limit >= 0:
+                visit(right)
+
+        visit(self._tree)
+        return [(self.locations[loc_id], chord_to_km(dist)) for dist, loc_id in sorted(found)]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Locations inside the box; `min_lon > max_lon` means it crosses the antimeridian."""
+        self._ensure_loaded()
+        lo = bisect_left(self._lats, min_lat)
+        hi = bisect_right(self._lats, max_lat)
+        found = []
+        for _, loc_id in self._by_lat[lo:hi]:
+            lon = self.locations[loc_id]["longitude"]
+            if min_lon <= max_lon:
+                inside = min_lon <= lon <= max_lon
+            else:
+                inside = lon >= min_lon or lon <= max_lon
+            if inside:
+                found.append(self.locations[loc_id])
+        return found
+
+    def get(self, loc_id):
+        self._ensure_loaded()
+        return self.locations.get(loc_id)
+
+    def find_by_name(self, name):
+        self._ensure_loaded()
+        for loc in self.locations.values():
+            if loc["name"].lower() == name.lower():
+                return loc
+        return None
+
+    def matching(self, region=None, country=None):
+        """Locations whose region and/or country match, case-insensitively."""
+        self._ensure_loaded()
+        return [
+            loc for loc in self.locations.values()
+            if (not region or loc["region"].lower() == region.lower())
+            and (not country or loc["country"].lower() == country.lower())
+        ]
+
+
+def select_locations(args):
+    """
+    Apply the area parameters shared by /locations/search, /climate,
+    /summary and /trends:
+
+      - `region`, `country`
+      - `lat` + `lon` with `radius_km` and/or `k` (nearest stations)
+      - `min_lat`, `min_lon`, `max_lat`, `max_lon` (bounding box)
+
+    Returns a list of (location, distance_km or None), or None when no area
+    parameter was given. Raises ValueError for malformed parameters.
+    """
+    region    = args.get("region", type=str)
+    country   = args.get("country", type=str)
+    lat       = args.get("lat", type=float)
+    lon       = args.get("lon", type=float)
+    radius_km = args.get("radius_km", type=float)
+    k         = args.get("k", type=int)
+    bbox      = [args.get(key, type=float) for key in ("min_lat", "min_lon", "max_lat", "max_lon")]
+
+    near = lat is not None or lon is not None or radius_km is not None or k is not None
+    if not (region or country or near or any(v is not None for v in bbox)):
+        return None
+
+    candidates = None  # id -> location, from the non-distance filters
+    if region or country:
+        candidates = {loc["id"]: loc for loc in location_index.matching(region, country)}
+
+    if any(v is not None for v in bbox):
+        if any(v is None for v in bbox):
+            raise ValueError("min_lat, min_lon, max_lat and max_lon must be given together")
+        if bbox[0] > bbox[2]:
+            raise ValueError("min_lat must not exceed max_lat")
+        in_box = location_index.within_bbox(*bbox)
+        candidates = {
+            loc["id"]: loc for loc in in_box
+            if candidates is None or loc["id"] in candidates
+        }
+
+    if not near:
+        return [(loc, None) for loc in sorted(candidates.values(), key=lambda l: l["name"])]
+
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat and lon must both be given, within [-90, 90] and [-180, 180]")
+    if radius_km is None and k is None:
+        raise ValueError("radius_km or k is required with lat/lon")
+    if radius_km is not None and radius_km < 0:
+        raise ValueError("radius_km must be non-negative")
+    if k is not None and k < 1:
+        raise ValueError("k must be at least 1")
+
+    if radius_km is not None:
+        hits = location_index.within_radius(lat, lon, radius_km)
+    elif candidates is None:
+        hits = location_index.nearest(lat, lon, k)
+    else:
+        # k nearest among already-filtered stations: rank just those
+        target = to_unit_vector(lat, lon)
+        hits   = sorted(
+            ((loc, chord_to_km(math.dist(target, to_unit_vector(loc["latitude"], loc["longitude"]))))
+             for loc in candidates.values()),
+            key=lambda h: h[1]
+        )
+    if candidates is not None:
+        hits = [h for h in hits if h[0]["id"] in candidates]
+    return hits[:k] if k is not None else hits
+
+
+def area_location_ids(args):
+    """Ids picked by the area parameters, or None when there are none."""
+    selected = select_locations(args)
+    if selected is None:
+        return None
+    return [loc["id"] for loc, _ in selected]
+
+
+def location_ids_clause(column, location_ids):
+    """SQL fragment + params restricting `column` to `location_ids`."""
+    if not location_ids:
+        return "1=0", []
+    return f"{column} IN ({', '.join(['%s'] * len(location_ids))})", list(location_ids)
+
+
+def average_across_stations(points):
+    """
+    Collapse trend points from several stations into one point per date.
+    Each station's readings for a date are averaged first, then the stations,
+    so a station reporting twice does not count double. The pooled point
+    keeps the lowest quality that went into it.
+    """
+    by_date = {}
+    for p in points:
+        by_date.setdefault(p["date"], {}).setdefault(p["location_id"], []).append(p)
+
+    pooled = []
+    for dt, stations in by_date.items():
+        readings = [p for station in stations.values() for p in station]
+        pooled.append({
+            "date":        dt,
+            "value":       statistics.mean(
+                statistics.mean(p["value"] for p in station) for station in stations.values()
+            ),
+            "quality":     min((p["quality"] for p in readings), key=lambda q: QUALITY_WEIGHTS.get(q, 0.0)),
+            "location_id": None
+        })
+    return pooled
+
+
+location_index = LocationIndex()
+
+
+# ─── Multi-series Comparison ──────────────────────────────────────────────────
+COMPARE_INTERVALS = {  # grid step -> SQL bucket expression
+    "day":   "DATE_FORMAT(c.date, '%Y-%m-%d')",
+    "week":  "DATE_FORMAT(DATE_SUB(c.date, INTERVAL WEEKDAY(c.date) DAY), '%Y-%m-%d')",
+    "month": "DATE_FORMAT(c.date, '%Y-%m-01')"
+}
+COMPARE_MAX_SERIES  = 50
+COMPARE_MAX_GRID    = 5000
+COMPARE_MAX_WORK    = 20_000_000  # correlation_work() budget, about a second at ~50 ns per product
+COMPARE_DEFAULT_LAG = 3
+COMPARE_MAX_LAG     = 12
+COMPARE_MIN_OVERLAP = 3   # common points needed for a correlation
+
+QUALITY_WEIGHT_CASE = "CASE " + " ".join(
+    f"WHEN c.quality = '{q}' THEN {w}" for q, w in QUALITY_WEIGHTS.items()
+) + " ELSE 0 END"
+
+
+def grid_bucket(d, interval):
+    """Start of the grid cell containing `d`, matching COMPARE_INTERVALS."""
+    if interval == "week":
+        return date.fromordinal(d.toordinal() - d.weekday())
+    if interval == "month":
+        return date(d.year, d.month, 1)
+    return d
+
+
+def grid_dates(first, last, interval):
+    """Every grid cell start from `first` through `last`."""
+    dates = []
+    current = first
+    while current <= last:
+        dates.append(current)
+        if interval == "month":
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current = date.fromordinal(current.toordinal() + (7 if interval == "week" else 1))
+    return dates
+
+
+def _dot(a, b):
+    return sum(map(operator.mul, a, b))
+
+
+def center_rows(matrix):
+    """
+    Subtract each row's mean over its observed cells; gaps (None) become 0.
+    Returns (centred rows, squared centred rows, 0/1 observed-mask rows).
+    """
+    centred, squares, masks = [], [], []
+    for row in matrix:
+        observed = [v for v in row if v is not None]
+        mean     = statistics.fmean(observed) if observed else 0.0
+        xs       = [v - mean if v is not None else 0.0 for v in row]
+        centred.append(xs)
+        squares.append([x * x for x in xs])
+        masks.append([1.0 if v is not None else 0.0 for v in row])
+    return centred, squares, masks
+
+
+def correlation_work(matrix, max_lag):
+    """
+    Products lagged_correlations() will compute for `matrix`: one dot product
+    of the overlap per pair and lag when both rows are gap-free, four when one
+    has gaps and six when both do (the masked sums cannot be shared).
+    """
+    cells  = len(matrix[0]) if matrix else 0
+    dense  = sum(1 for row in matrix if None not in row)
+    sparse = len(matrix) - dense
+    per_lag = dense * (dense - 1) + 2 * dense * sparse * 4 + sparse * (sparse - 1) * 6
+    work    = per_lag * cells // 2     # lag 0 covers each pair once
+    for lag in range(1, max_lag + 1):
+        work += per_lag * max(0, cells - lag)
+    return work
+
+
+def lagged_correlations(matrix, max_lag):
+    """
+    Pearson r between row i at t and row j at t + lag, over the cells both
+    observe, for every pair i < j and every lag in -max_lag..max_lag.
+
+    Rows are centred once with gaps zeroed. At lag 0 the gap-free rows are
+    scaled to unit length, so their correlations are one Gram product of
+    those rows. Every other pair and lag is one pass per lag: each row is
+    shifted once and the masked sums (n, Σx, Σy, Σx², Σy², Σxy) of a pair
+    are dot products of those slices, with plain sums reused for slices
+    without gaps. Pair (i, j) at lag -k is pair (j, i) at lag k, so only
+    lags 0..max_lag are computed.
+    Returns {(i, j, lag): (r or None, overlap)}.
+    """
+    xs, sq, ms = center_rows(matrix)
+    size   = len(matrix)
+    cells  = len(matrix[0]) if matrix else 0
+    result = {}
+
+    if cells >= COMPARE_MIN_OVERLAP:
+        units = {}
+        for i in range(size):
+            if None in matrix[i]:
+                continue
+            norm     = math.sqrt(sum(sq[i]))
+            units[i] = [x / norm for x in xs[i]] if norm > 0 else None  # None: flat row
+        dense = sorted(units)
+        for a, i in enumerate(dense):
+            for j in dense[a + 1:]:
+                r = None
+                if units[i] is not None and units[j] is not None:
+                    r = max(-1.0, min(1.0, _dot(units[i], units[j])))
+                result[(i, j, 0)] = (r, cells)
+
+    for lag in range(max_lag + 1):
+        upto = max(0, cells - lag)
+        # (values, squares, mask, gap-free?, Σ values, Σ squares, observed count)
+        head = [_lag_slice(x[:upto], s[:upto], m[:upto]) for x, s, m in zip(xs, sq, ms)]  # row at t
+        tail = [_lag_slice(x[lag:], s[lag:], m[lag:]) for x, s, m in zip(xs, sq, ms)]     # row at t + lag
+        for i in range(size):
+            xi, si, mi, full_i, sum_xi, sum_si, count_i = head[i]
+            for j in range(size):
+                if i == j or (lag == 0 and (j < i or (i, j, 0) in result)):
+                    continue
+                xj, sj, mj, full_j, sum_xj, sum_sj, count_j = tail[j]
+                if full_j:
+                    n, sx, sxx = count_i, sum_xi, sum_si
+                else:
+                    n, sx, sxx = round(_dot(mi, mj)), _dot(xi, mj), _dot(si, mj)
+                r = None
+                if n >= COMPARE_MIN_OVERLAP:
+                    sy, syy = (sum_xj, sum_sj) if full_i else (_dot(mi, xj), _dot(mi, sj))
+                    vx      = sxx - sx * sx / n
+                    vy      = syy - sy * sy / n
+                    # A series that is flat over the overlap has no correlation
+                    if vx > 1e-12 * sxx and vy > 1e-12 * syy:
+                        r = (_dot(xi, xj) - sx * sy / n) / math.sqrt(vx * vy)
+                        r = max(-1.0, min(1.0, r))
+                key = (i, j, lag) if i < j else (j, i, -lag)
+                result[key] = (r, n)
+    return result
+
+
+def _lag_slice(xs, squares, mask):
+    count = round(sum(mask))
+    return xs, squares, mask, count == len(mask), sum(xs), sum(squares), count
+
+
+def series_trend(grid, values):
+    """Least-squares trend over the observed cells, as in /trends (rate per ~30 days)."""
+    pts = [(d.toordinal(), v) for d, v in zip(grid, values) if v is not None]
+    if len(pts) < 2:
+        return {"direction": "stable", "rate": 0.0, "confidence": 0.0}
+    xs = [x for x, _ in pts]
+    ys = [y for _, y in pts]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    sum_x2 = sum((x - mean_x) ** 2 for x in xs)
+    slope  = sum((x - mean_x) * (y - mean_y) for x, y in pts) / sum_x2 if sum_x2 else 0.0
+    ss_tot = sum((y - mean_y) ** 2 for y in ys)
+    ss_res = sum((y - (mean_y + slope * (x - mean_x))) ** 2 for x, y in pts)
+    r_squared = max(0.0, 1 - ss_res / ss_tot) if ss_tot > 0 else 0.0
+
+    rate_per_month = slope * 30
+    if abs(rate_per_month) < 1e-6:
+        direction = "stable"
+    elif rate_per_month > 0:
+        direction = "increasing"
+    else:
+        direction = "decreasing"
+    return {
+        "direction":  direction,
+        "rate":       round(rate_per_month, 3),
+        "confidence": round(r_squared, 3)
+    }
+
+
 # ─── API Endpoints ────────────────────────────────────────────────────────────
 
 @app.route("/api/v1/locations", methods=["GET"])
@@ -194,6 +1562,24 @@ def get_metrics():
     return jsonify({"data": rows})
 
 
+@app.route("/api/v1/locations/search", methods=["GET"])
+def search_locations():
+    try:
+        selected = select_locations(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if selected is None:
+        return jsonify({"error": "give region, country, lat/lon with radius_km or k, or a bounding box"}), 400
+
+    data = []
+    for loc, dist in selected:
+        entry = dict(loc)
+        if dist is not None:
+            entry["distance_km"] = round(dist, 3)
+        data.append(entry)
+    return jsonify({"data": data})
+
+
 @app.route("/api/v1/climate", methods=["GET"])
 def get_climate_data():
     args          = request.args
@@ -216,6 +1602,12 @@ def get_climate_data():
     page     = args.get("page", default=1, type=int)
     per_page = args.get("per_page", default=50, type=int)
 
+    # Optional area filter (region, country, radius, nearest, bounding box)
+    try:
+        area_ids = area_location_ids(args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
     # We JOIN locations and metrics so we can filter by name and also return them in the result
     sql = """
       SELECT
@@ -243,6 +1635,11 @@ def get_climate_data():
         sql += " AND m.name = %s"
         params.append(metric_name)
 
+    if area_ids is not None:
+        clause, ids = location_ids_clause("c.location_id", area_ids)
+        sql += f" AND {clause}"
+        params.extend(ids)
+
     if start_date:
         sql += " AND c.date >= %s"
         params.append(start_date)
@@ -258,6 +1655,26 @@ def get_climate_data():
     cursor.close()
     conn.close()
 
+    # Archived years are older than anything still in the table, so they go first
+    archived = read_archived_rows(
+        start_date, end_date, location_name=loc_name, metric_name=metric_name,
+        location_ids=area_ids
+    )
+    rows = [
+        {
+            "id":            r["id"],
+            "location_id":   r["location_id"],
+            "location_name": r["location_name"],
+            "metric_id":     r["metric_id"],
+            "metric_name":   r["metric_name"],
+            "date":          r["date"].strftime("%Y-%m-%d"),
+            "value":         r["value"],
+            "quality":       r["quality"],
+            "unit":          r["unit"]
+        }
+        for r in archived
+    ] + rows
+
     # Apply quality_threshold filtering in Python
     if q_thresh_val is not None:
         rows = [r for r in rows if QUALITY_WEIGHTS.get(r["quality"], 0.0) >= q_thresh_val]
@@ -299,6 +1716,18 @@ def get_summary():
             )
         q_thresh_val = QUALITY_WEIGHTS[q_thresh_key]
 
+    # Optional per-group breakdown, computed in the same grouped queries
+    group_by = args.get("group_by", type=str)
+    if group_by and group_by.lower() not in SUMMARY_GROUPS:
+        return jsonify({"error": "group_by must be one of: location, region, country"}), 400
+    group_col  = SUMMARY_GROUPS[group_by.lower()] if group_by else None
+    group_expr = f"l.{group_col}" if group_col else "NULL"
+
+    try:
+        area_ids = area_location_ids(args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
     # Build WHERE clauses
     where = ["1=1"]
     params = []
@@ -309,6 +1738,10 @@ def get_summary():
     if metric_id:
         where.append("c.metric_id = %s")
         params.append(metric_id)
+    if area_ids is not None:
+        clause, ids = location_ids_clause("c.location_id", area_ids)
+        where.append(clause)
+        params.extend(ids)
     if start_date:
         where.append("c.date >= %s")
         params.append(start_date)
@@ -339,20 +1772,23 @@ def get_summary():
       END
     """
 
-    # Summary query: weighted min, max, avg per metric
+    # Summary query: weighted min, max, avg per metric (and per group)
     summary_sql = f"""
       SELECT
+        {group_expr} AS grp,
         c.metric_id,
         m.name AS metric,
         m.unit AS unit,
         MIN(c.value) AS weighted_min,  -- same as raw min since min ignores weight
         MAX(c.value) AS weighted_max,  -- same as raw max
-        SUM(c.value * ({weight_case})) / NULLIF(SUM({weight_case}), 0) AS weighted_avg
+        SUM(c.value * ({weight_case})) AS weighted_sum,
+        SUM({weight_case}) AS weight_total
       FROM climate_data c
-      JOIN metrics m ON c.metric_id = m.id
+      JOIN metrics m   ON c.metric_id   = m.id
+      JOIN locations l ON c.location_id = l.id
       WHERE {" AND ".join(where)}
-      GROUP BY c.metric_id, m.name, m.unit
-      ORDER BY c.metric_id;
+      GROUP BY grp, c.metric_id, m.name, m.unit
+      ORDER BY grp, c.metric_id;
     """
 
     conn = get_db_connection()
@@ -360,56 +1796,93 @@ def get_summary():
     cursor.execute(summary_sql, tuple(params))
     summary_rows = cursor.fetchall()
 
-    # Distribution query: count of each quality per metric
+    # Distribution query: count of each quality per metric (and per group)
     dist_sql = f"""
       SELECT
+        {group_expr} AS grp,
         c.metric_id,
         c.quality,
         COUNT(*) AS count
       FROM climate_data c
+      JOIN locations l ON c.location_id = l.id
       WHERE {" AND ".join(where)}
-      GROUP BY c.metric_id, c.quality
-      ORDER BY c.metric_id;
+      GROUP BY grp, c.metric_id, c.quality
+      ORDER BY grp, c.metric_id;
     """
     cursor.execute(dist_sql, tuple(params))
     dist_rows = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    # Build a map: { metric_id: { quality: count, ... }, ... }
+    # Build a map: { (group, metric_id): { quality: count, ... }, ... }
     dist_map = {}
     for r in dist_rows:
-        mid = r["metric_id"]
+        key = (r["grp"], r["metric_id"])
         q   = r["quality"].lower()
         cnt = r["count"]
-        dist_map.setdefault(mid, {})[q] = cnt
+        dist_map.setdefault(key, {})[q] = cnt
+
+    # Fold archived years into the per-metric aggregates
+    archived = read_archived_rows(
+        start_date, end_date, location_id=loc_id, metric_id=metric_id, location_ids=area_ids
+    )
+    if q_thresh_val is not None:
+        archived = [r for r in archived if QUALITY_WEIGHTS.get(r["quality"], 0.0) >= q_thresh_val]
+    summary_map = {(s["grp"], s["metric_id"]): s for s in summary_rows}
+    for r in archived:
+        grp = None
+        if group_col:
+            grp = r["location_name"] if group_col == "name" else r[group_col]
+        key = (grp, r["metric_id"])
+        w   = QUALITY_WEIGHTS.get(r["quality"], 0.0)
+        s   = summary_map.setdefault(key, {
+            "grp":          grp,
+            "metric_id":    r["metric_id"],
+            "metric":       r["metric_name"],
+            "unit":         r["unit"],
+            "weighted_min": r["value"],
+            "weighted_max": r["value"],
+            "weighted_sum": 0.0,
+            "weight_total": 0.0
+        })
+        s["weighted_min"]  = min(float(s["weighted_min"]), r["value"])
+        s["weighted_max"]  = max(float(s["weighted_max"]), r["value"])
+        s["weighted_sum"]  = float(s["weighted_sum"] or 0.0) + r["value"] * w
+        s["weight_total"]  = float(s["weight_total"] or 0.0) + w
+        q_counts = dist_map.setdefault(key, {})
+        q_counts[r["quality"]] = q_counts.get(r["quality"], 0) + 1
+    summary_rows = [summary_map[key] for key in sorted(summary_map, key=lambda k: (k[0] or "", k[1]))]
 
     # Format final response
     data = []
     for s in summary_rows:
-        mid       = s["metric_id"]
+        key       = (s["grp"], s["metric_id"])
         metric    = s["metric"]
         unit      = s["unit"]
         wmin      = float(s["weighted_min"])
         wmax      = float(s["weighted_max"])
-        wavg      = float(s["weighted_avg"]) if s["weighted_avg"] is not None else None
+        wtotal    = float(s["weight_total"] or 0.0)
+        wavg      = float(s["weighted_sum"]) / wtotal if wtotal else None
 
         # Build quality_distribution with defaults
         qdist = {
-            "excellent":    dist_map.get(mid, {}).get("excellent", 0),
-            "good":         dist_map.get(mid, {}).get("good", 0),
-            "questionable": dist_map.get(mid, {}).get("questionable", 0),
-            "poor":         dist_map.get(mid, {}).get("poor", 0),
+            "excellent":    dist_map.get(key, {}).get("excellent", 0),
+            "good":         dist_map.get(key, {}).get("good", 0),
+            "questionable": dist_map.get(key, {}).get("questionable", 0),
+            "poor":         dist_map.get(key, {}).get("poor", 0),
         }
 
-        data.append({
+        entry = {
             "metric":               metric,
             "unit":                 unit,
             "weighted_min":         wmin,
             "weighted_max":         wmax,
             "weighted_avg":         wavg,
             "quality_distribution": qdist
-        })
+        }
+        if group_col:
+            entry[group_by.lower()] = s["grp"]
+        data.append(entry)
 
     return jsonify({"data": data})
 
@@ -435,10 +1908,27 @@ def get_trends():
             )
         q_thresh_val = QUALITY_WEIGHTS[q_thresh_key]
 
+    # "seasonal"/"rolling" read the anomaly index; "global" is the legacy whole-range z-score
+    anomaly_method = (args.get("anomaly_method", type=str) or "global").lower()
+    if anomaly_method not in ANOMALY_METHODS:
+        return (
+            jsonify({
+                "error": "anomaly_method must be one of: global, seasonal, rolling"
+            }),
+            400
+        )
+
+    # Optional area filter; matching stations are averaged into one series per metric
+    try:
+        area_ids = area_location_ids(args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
     # Build SQL to fetch raw data (date, value, metric_name, unit, quality)
     sql = """
       SELECT
         c.date AS date_col,
+        c.location_id,
         c.value,
         c.quality,
         m.name AS metric_name,
@@ -458,6 +1948,11 @@ def get_trends():
         sql += " AND m.name = %s"
         params.append(metric_name)
 
+    if area_ids is not None:
+        clause, ids = location_ids_clause("c.location_id", area_ids)
+        sql += f" AND {clause}"
+        params.extend(ids)
+
     if start_date:
         sql += " AND c.date >= %s"
         params.append(start_date)
@@ -473,6 +1968,23 @@ def get_trends():
     cursor.close()
     conn.close()
 
+    # Include readings from archived years
+    archived = read_archived_rows(
+        start_date, end_date, location_name=loc_name, metric_name=metric_name,
+        location_ids=area_ids
+    )
+    rows = [
+        {
+            "date_col":    r["date"],
+            "location_id": r["location_id"],
+            "value":       r["value"],
+            "quality":     r["quality"],
+            "metric_name": r["metric_name"],
+            "unit":        r["unit"]
+        }
+        for r in archived
+    ] + rows
+
     # Apply quality_threshold filtering if provided
     if q_thresh_val is not None:
         rows = [
@@ -480,6 +1992,12 @@ def get_trends():
             if QUALITY_WEIGHTS.get(r["quality"].lower(), 0.0) >= q_thresh_val
         ]
 
+    indexed_anomalies = {}
+    if anomaly_method != "global":
+        indexed_anomalies = fetch_indexed_anomalies(
+            anomaly_method, loc_name, metric_name, start_date, end_date, area_ids
+        )
+
     # Group rows by metric_name
     grouped = {}
     for r in rows:
@@ -509,9 +2027,16 @@ def get_trends():
         grouped[metric]["points"].append({
             "date": dt,
             "value": float(r["value"]),
-            "quality": r["quality"].lower()
+            "quality": r["quality"].lower(),
+            "location_id": r["location_id"]
         })
 
+    # Stations in an area differ in level; regress on their per-date average
+    # rather than on a mix of raw readings from different stations
+    if area_ids is not None:
+        for info in grouped.values():
+            info["points"] = average_across_stations(info["points"])
+
     # Prepare final response structure
     result = {}
 
@@ -555,22 +2080,35 @@ def get_trends():
             "confidence": round(r_squared, 3)
         }
 
-        # Detect anomalies: |value - mean| > 3 * std_dev
         anomalies = []
-        if n > 1:
-            std_dev = statistics.stdev(ys)
-            for p in pts:
-                deviation = 0.0
-                if std_dev > 0:
-                    deviation = (p["value"] - mean_y) / std_dev
-                # Change threshold from 3 to 2:
-                if abs(deviation) > 2:
-                    anomalies.append({
-                        "date": p["date"].strftime("%Y-%m-%d"),
-                        "value": p["value"],
-                        "deviation": round(deviation, 2)
-                    })
-                    
+        if anomaly_method == "global":
+            # Detect anomalies: |value - mean| > 2 * std_dev over the whole range
+            if n > 1:
+                std_dev = statistics.stdev(ys)
+                for p in pts:
+                    deviation = 0.0
+                    if std_dev > 0:
+                        deviation = (p["value"] - mean_y) / std_dev
+                    if abs(deviation) > 2:
+                        anomalies.append({
+                            "date": p["date"].strftime("%Y-%m-%d"),
+                            "value": p["value"],
+                            "deviation": round(deviation, 2)
+                        })
+        else:
+            # Baselines use every reading; quality_threshold only filters what is reported
+            for a in indexed_anomalies.get(metric, []):
+                if q_thresh_val is not None and QUALITY_WEIGHTS.get(a["quality"], 0.0) < q_thresh_val:
+                    continue
+                anomalies.append({
+                    "date":      a["date"],
+                    "location":  a["location_name"],
+                    "value":     float(a["value"]),
+                    "baseline":  round(float(a["baseline"]), 2),
+                    "robust_z":  round(float(a["deviation"]), 2),
+                    "quality":   a["quality"]
+                })
+
         # Seasonality detection (group by year & season)
         season_data = {}  # {(year, season): [values]}
         for p in pts:
@@ -635,6 +2173,278 @@ def get_trends():
 
     return jsonify(result)
 
+@app.route("/api/v1/compare", methods=["GET"])
+def compare_series():
+    args         = request.args
+    loc_names    = [n.strip() for n in (args.get("locations", type=str) or "").split(",") if n.strip()]
+    metric_names = [n.strip() for n in (args.get("metrics", type=str) or "").split(",") if n.strip()]
+    start_date   = parse_date(args.get("start_date"))
+    end_date     = parse_date(args.get("end_date"))
+    interval     = (args.get("interval", type=str) or "month").lower()
+    max_lag      = args.get("max_lag", default=COMPARE_DEFAULT_LAG, type=int)
+
+    if interval not in COMPARE_INTERVALS:
+        return jsonify({"error": "interval must be one of: day, week, month"}), 400
+    if not 0 <= max_lag <= COMPARE_MAX_LAG:
+        return jsonify({"error": f"max_lag must be between 0 and {COMPARE_MAX_LAG}"}), 400
+    if not metric_names:
+        return jsonify({"error": "metrics is required (comma-separated metric names)"}), 400
+
+    # Parse quality_threshold as a string key → numeric threshold
+    q_thresh_key = args.get("quality_threshold", type=str)
+    q_thresh_val = None
+    if q_thresh_key:
+        q_thresh_key = q_thresh_key.lower()
+        if q_thresh_key not in QUALITY_WEIGHTS:
+            return (
+                jsonify({
+                    "error": "quality_threshold must be one of: excellent, good, questionable, poor"
+                }),
+                400
+            )
+        q_thresh_val = QUALITY_WEIGHTS[q_thresh_key]
+
+    # Locations come from explicit names and/or the shared area parameters
+    try:
+        area = select_locations(args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    locations = {loc["id"]: loc for loc, _ in (area or [])}
+    for name in loc_names:
+        loc = location_index.find_by_name(name)
+        if loc is None:
+            return jsonify({"error": f"unknown location: {name}"}), 400
+        locations[loc["id"]] = loc
+    if not locations:
+        return jsonify({"error": "give locations (comma-separated names) or an area filter"}), 400
+
+    conn   = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, name, unit FROM metrics WHERE name IN ("
+        + ", ".join(["%s"] * len(metric_names)) + ");",
+        tuple(metric_names)
+    )
+    metrics = {m["id"]: m for m in cursor.fetchall()}
+    # `name IN (...)` matches case-insensitively, so compare the same way
+    found   = {m["name"].lower() for m in metrics.values()}
+    missing = sorted({name for name in metric_names if name.lower() not in found})
+    if missing:
+        cursor.close()
+        conn.close()
+        return jsonify({"error": f"unknown metric: {', '.join(missing)}"}), 400
+    if len(locations) * len(metrics) > COMPARE_MAX_SERIES:
+        cursor.close()
+        conn.close()
+        return jsonify({"error": f"at most {COMPARE_MAX_SERIES} location × metric series per request"}), 400
+
+    # One grouped query buckets every series onto the grid with quality-weighted means
+    loc_clause, loc_params = location_ids_clause("c.location_id", list(locations))
+    where  = [loc_clause, "c.metric_id IN (" + ", ".join(["%s"] * len(metrics)) + ")"]
+    params = loc_params + list(metrics)
+    if start_date:
+        where.append("c.date >= %s")
+        params.append(start_date)
+    if end_date:
+        where.append("c.date <= %s")
+        params.append(end_date)
+    if q_thresh_val is not None:
+        where.append(f"{QUALITY_WEIGHT_CASE} >= %s")
+        params.append(q_thresh_val)
+
+    cursor.execute(f"""
+      SELECT
+        c.location_id,
+        c.metric_id,
+        {COMPARE_INTERVALS[interval]} AS bucket,
+        SUM(c.value * ({QUALITY_WEIGHT_CASE})) AS weighted_sum,
+        SUM({QUALITY_WEIGHT_CASE}) AS weight_total
+      FROM climate_data c
+      WHERE {" AND ".join(where)}
+      GROUP BY c.location_id, c.metric_id, bucket;
+    """, tuple(params))
+    cells = {}  # (location_id, metric_id) -> {bucket date: [weighted sum, weight total]}
+    for r in cursor.fetchall():
+        cell = cells.setdefault((r["location_id"], r["metric_id"]), {})
+        cell[parse_date(r["bucket"])] = [float(r["weighted_sum"] or 0.0), float(r["weight_total"] or 0.0)]
+    cursor.close()
+    conn.close()
+
+    # Fold in archived years
+    for r in read_archived_rows(start_date, end_date, location_ids=set(locations)):
+        if r["metric_id"] not in metrics:
+            continue
+        w = QUALITY_WEIGHTS.get(r["quality"], 0.0)
+        if q_thresh_val is not None and w < q_thresh_val:
+            continue
+        cell = cells.setdefault((r["location_id"], r["metric_id"]), {})
+        acc  = cell.setdefault(grid_bucket(r["date"], interval), [0.0, 0.0])
+        acc[0] += r["value"] * w
+        acc[1] += w
+
+    # Shared grid from the first to the last observed cell
+    observed = [d for cell in cells.values() for d in cell]
+    grid     = grid_dates(min(observed), max(observed), interval) if observed else []
+    if len(grid) > COMPARE_MAX_GRID:
+        return jsonify({"error": f"date grid exceeds {COMPARE_MAX_GRID} cells; narrow the range or use a coarser interval"}), 400
+
+    # Aligned S × T matrix, one row per (location, metric); None marks an empty cell
+    keys   = sorted(
+        ((loc_id, met_id) for loc_id in locations for met_id in metrics),
+        key=lambda k: (locations[k[0]]["name"], metrics[k[1]]["name"])
+    )
+    labels = [f"{locations[l]['name']}:{metrics[m]['name']}" for l, m in keys]
+    matrix = []
+    for key in keys:
+        cell = cells.get(key, {})
+        matrix.append([
+            cell[d][0] / cell[d][1] if d in cell and cell[d][1] > 0 else None
+            for d in grid
+        ])
+    if correlation_work(matrix, max_lag) > COMPARE_MAX_WORK:
+        return jsonify({
+            "error": "comparison too large to correlate; use fewer series, a shorter range, "
+                     "a coarser interval or a smaller max_lag"
+        }), 400
+
+    # Correlation matrix and lagged cross-correlation over every pair
+    size        = len(keys)
+    corr        = [[None] * size for _ in range(size)]
+    cross_corr  = []
+    lags        = range(-max_lag, max_lag + 1)
+    by_pair_lag = lagged_correlations(matrix, max_lag)
+    for i in range(size):
+        observed   = [v for v in matrix[i] if v is not None]
+        corr[i][i] = 1.0 if len(set(observed)) > 1 else None
+        for j in range(i + 1, size):
+            by_lag = []
+            for lag in lags:
+                r, n = by_pair_lag[(i, j, lag)]
+                r    = round(r, 3) if r is not None else None
+                by_lag.append({"lag": lag, "r": r, "n": n})
+                if lag == 0:
+                    corr[i][j] = corr[j][i] = r
+            scored = [e for e in by_lag if e["r"] is not None]
+            best   = max(scored, key=lambda e: abs(e["r"])) if scored else None
+            cross_corr.append({
+                "a":         labels[i],
+                "b":         labels[j],
+                "best_lag":  best["lag"] if best else None,
+                "best_r":    best["r"] if best else None,
+                "lags":      by_lag
+            })
+
+    series = []
+    for (loc_id, met_id), label, values in zip(keys, labels, matrix):
+        trend = series_trend(grid, values)
+        trend["unit"] = metrics[met_id]["unit"]
+        series.append({
+            "key":      label,
+            "location": locations[loc_id]["name"],
+            "metric":   metrics[met_id]["name"],
+            "unit":     metrics[met_id]["unit"],
+            "values":   [round(v, 3) if v is not None else None for v in values],
+            "trend":    trend
+        })
+
+    return jsonify({
+        "data": {
+            "interval":          interval,
+            "grid":              [d.strftime("%Y-%m-%d") for d in grid],
+            "series":            series,
+            "correlation":       {"labels": labels, "matrix": corr},
+            "cross_correlation": cross_corr
+        }
+    })
+
+@app.route("/api/v1/ingest", methods=["POST"])
+def ingest_readings():
+    payload  = request.get_json(silent=True)
+    # Accept either {"readings": [...]} or a bare JSON array
+    readings = payload.get("readings") if isinstance(payload, dict) else payload
+    if not isinstance(readings, list) or not readings:
+        return jsonify({"error": "body must be a non-empty list of readings"}), 400
+    if len(readings) > INGEST_MAX_BATCH:
+        return jsonify({"error": f"at most {INGEST_MAX_BATCH} readings per request"}), 413
+
+    conn   = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM locations;")
+    location_ids = {r[0] for r in cursor.fetchall()}
+    cursor.execute("SELECT id FROM metrics;")
+    metric_ids = {r[0] for r in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+
+    # Validate the whole batch up front so a request is accepted or rejected as a unit
+    rows   = []
+    errors = []
+    for idx, entry in enumerate(readings):
+        row, err = validate_reading(entry, location_ids, metric_ids)
+        if err:
+            errors.append({"index": idx, "error": err})
+        else:
+            rows.append(row)
+    if errors:
+        return jsonify({"error": "invalid readings", "details": errors}), 400
+
+    try:
+        # add() flushes by itself once INGEST_FLUSH_SIZE rows are pending
+        pending = ingest_buffer.add(rows)
+        if request.args.get("flush", type=str) in ("1", "true"):
+            ingest_buffer.flush()
+            pending = ingest_buffer.pending()
+    except IngestBufferFull as exc:
+        return jsonify({"error": f"ingest buffer is full ({exc}); retry later"}), 503
+    except mysql.connector.Error as exc:
+        # Rows stay buffered and are retried by the next flush
+        return jsonify({"error": f"readings buffered but flush failed: {exc}"}), 503
+
+    return jsonify({
+        "data": {
+            "accepted": len(rows),
+            "pending":  pending,
+            "dead_letters_total": len(ingest_buffer.dead_letters)
+        }
+    }), 202
+
+@app.route("/api/v1/ingest/rejected", methods=["GET"])
+def ingest_rejected():
+    rejected = []
+    for entry in list(ingest_buffer.dead_letters):
+        row_id, loc_id, metric_id, dt, value, quality = entry["row"]
+        rejected.append({
+            "id":          row_id,
+            "location_id": loc_id,
+            "metric_id":   metric_id,
+            "date":        dt.strftime("%Y-%m-%d"),
+            "value":       value,
+            "quality":     quality,
+            "error":       entry["error"]
+        })
+    return jsonify({"data": rejected})
+
+@app.route("/api/v1/stream", methods=["GET"])
+def stream_events():
+    subscriber = event_broker.subscribe()
+
+    def generate():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control":     "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 if __name__ == "__main__":
     # Create tables + seed data on startup
     init_db()
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the Flask app module directly, the same way `python app.py` runs it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn    = conn
+        self._result = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.conn.statements.append((sql, params))
+        rows = next((rows for needle, rows in self.conn.results if needle in sql), [])
+        # Copies, since the app may modify dictionary rows in place
+        self._result = [dict(r) if isinstance(r, dict) else r for r in rows]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def __iter__(self):
+        return iter(self._result)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self.conn.attempts.append(rows)
+        error = self.conn.error(self.conn, rows) if callable(self.conn.error) else self.conn.error
+        if error is not None:
+            raise error
+        self.conn.pending.extend(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """
+    Scripted stand-in for a mysql.connector connection.
+
+    `results` is a list of (SQL substring, rows): execute() serves the rows of
+    the first substring found in the statement, or nothing. `error` is raised
+    by executemany(); it may also be a callable (conn, rows) returning the
+    error to raise or None. Rows from executemany() count as committed only
+    after commit().
+    """
+
+    def __init__(self, results=(), error=None):
+        self.results    = list(results)
+        self.error      = error
+        self.statements = []   # (whitespace-normalised SQL, params) per execute()
+        self.attempts   = []   # rows per executemany()
+        self.pending    = []
+        self.committed  = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Point app.get_db_connection at a FakeConnection built from the given arguments."""
+    def install(*args, **kwargs):
+        conn = FakeConnection(*args, **kwargs)
+        monkeypatch.setattr(app, "get_db_connection", lambda: conn)
+        return conn
+    return install
@@ -0,0 +1,115 @@
+import random
+import statistics
+from datetime import date, timedelta
+
+import mysql.connector
+import pytest
+
+import app
+
+
+def test_rolling_window_matches_a_full_recompute():
+    rng    = random.Random(7)
+    window = app.RollingWindow(10)
+    seen   = []
+    for _ in range(200):
+        value = rng.choice([rng.gauss(0, 5), 1.0])   # plenty of duplicates
+        window.add(value)
+        seen.append(value)
+        recent = seen[-10:]
+        median = statistics.median(recent)
+        assert len(window) == len(recent)
+        assert window.median() == pytest.approx(median)
+        assert window.mad(median) == pytest.approx(statistics.median(abs(v - median) for v in recent))
+
+
+def daily(values, start=date(2024, 1, 1)):
+    return [(start + timedelta(days=i), v) for i, v in enumerate(values)]
+
+
+def test_rolling_flags_a_spike_against_the_trailing_window():
+    baseline = app.RobustBaseline("rolling", window=10, min_periods=5)
+    readings = daily([10, 11, 9, 10, 12, 11, 10, 40, 10, 11])
+    hits = {dt: baseline.score(dt, v) for dt, v in readings}
+
+    spike = hits.pop(readings[7][0])
+    assert spike is not None
+    assert spike[0] == 10                           # median of the seven readings before it
+    assert spike[1] == pytest.approx(0.6745 * 30 / 1)   # MAD of those readings is 1
+    assert all(hit is None for hit in hits.values())
+
+
+def test_no_scores_before_min_periods_or_on_a_flat_window():
+    baseline = app.RobustBaseline("rolling", window=10, min_periods=5)
+    assert [baseline.score(dt, v) for dt, v in daily([1, 1, 100])] == [None, None, None]
+
+    flat = app.RobustBaseline("rolling", window=10, min_periods=3)
+    assert [flat.score(dt, v) for dt, v in daily([0, 0, 0, 0, 25])] == [None] * 5
+
+
+def monthly_readings(years, summer_spike=None):
+    """Mid-month readings: warm summers, cold winters, small noise."""
+    rng      = random.Random(3)
+    readings = []
+    for year in years:
+        for month in range(1, 13):
+            value = (25 if month in (6, 7, 8) else 5) + rng.uniform(-1, 1)
+            if summer_spike == (year, month):
+                value += 15
+            readings.append((date(year, month, 15), value))
+    return readings
+
+
+# Every month has 3 readings by 2018; the residual window fills during 2018
+WARMED_UP = date(2019, 1, 1)
+
+
+def test_seasonal_does_not_flag_ordinary_summers():
+    seasonal = app.RobustBaseline("seasonal", window=30, min_periods=3)
+    rolling  = app.RobustBaseline("rolling", window=30, min_periods=3)
+    readings = monthly_readings(range(2015, 2024))
+
+    assert not [dt for dt, v in readings if seasonal.score(dt, v) and dt >= WARMED_UP]
+    assert [dt for dt, v in readings if rolling.score(dt, v) and dt >= WARMED_UP]
+
+
+def test_seasonal_flags_a_hot_month_once_the_month_has_history():
+    seasonal = app.RobustBaseline("seasonal", window=30, min_periods=3)
+    readings = monthly_readings(range(2015, 2024), summer_spike=(2022, 7))
+
+    flagged = [dt for dt, v in readings if seasonal.score(dt, v) and dt >= WARMED_UP]
+    assert flagged == [date(2022, 7, 15)]
+
+
+def test_seasonal_falls_back_to_rolling_until_the_month_is_ready():
+    seasonal = app.RobustBaseline("seasonal", window=10, min_periods=5)
+    rolling  = app.RobustBaseline("rolling", window=10, min_periods=5)
+    values   = [10, 11, 9, 10, 12, 11, 10, 40, 10, 11]
+    readings = [(date(2024, month, 1), v) for month, v in enumerate(values, start=1)]
+
+    assert any(rolling.score(dt, v) for dt, v in readings)
+    rolling  = app.RobustBaseline("rolling", window=10, min_periods=5)
+
+    assert [seasonal.score(dt, v) for dt, v in readings] == \
+        [rolling.score(dt, v) for dt, v in readings]
+
+
+def test_failed_anomaly_insert_marks_series_stale(fake_db, monkeypatch):
+    index = app.AnomalyIndex()
+    for method in index.INDEXED_METHODS:
+        b = app.RobustBaseline(method, window=10, min_periods=5)
+        for dt, v in daily([10, 11, 9, 10, 12, 11, 10]):
+            b.score(dt, v)
+        index._baselines[(1, 1, method)] = b
+
+    fake_db(error=mysql.connector.errors.OperationalError(msg="server has gone away"))
+    with pytest.raises(mysql.connector.errors.OperationalError):
+        index.update([(None, 1, 1, date(2024, 1, 8), 40.0, "good")])
+
+    assert index._stale == {(1, 1)}
+    assert not index._baselines
+
+    rebuilt = []
+    monkeypatch.setattr(index, "rebuild", lambda series: rebuilt.append(series))
+    index.update([(None, 2, 1, date(2024, 1, 9), 5.0, "good")])
+    assert rebuilt == [[(1, 1), (2, 1)]]
@@ -0,0 +1,122 @@
+from datetime import date
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "ARCHIVE_DIR", str(tmp_path))
+    app._read_archive_file.cache_clear()
+    return tmp_path
+
+
+def climate_db(fake_db, rows, partitions=()):
+    """Serve `rows` for the archive SELECT and `partitions` for the partition lookup."""
+    return fake_db(results=[
+        ("information_schema.PARTITIONS", [(name,) for name in partitions]),
+        ("quality FROM climate_data", rows),
+    ])
+
+
+@pytest.mark.parametrize("scheme, start, end, expected", [
+    ("yearly", date(2023, 5, 2), date(2025, 1, 1), [
+        ("p2023", date(2024, 1, 1)), ("p2024", date(2025, 1, 1)), ("p2025", date(2026, 1, 1)),
+    ]),
+    ("monthly", date(2024, 11, 30), date(2025, 2, 1), [
+        ("p2024_11", date(2024, 12, 1)), ("p2024_12", date(2025, 1, 1)),
+        ("p2025_01", date(2025, 2, 1)), ("p2025_02", date(2025, 3, 1)),
+    ]),
+    ("yearly", date(2025, 1, 1), date(2024, 12, 31), []),
+])
+def test_partition_bounds(monkeypatch, scheme, start, end, expected):
+    monkeypatch.setattr(app, "CLIMATE_PARTITIONING", scheme)
+    assert app.partition_bounds(start, end) == expected
+
+
+def test_archive_round_trip_merges_on_id_and_date(archive_dir, fake_db):
+    first = [
+        (1, 1, 1, date(2020, 1, 5), 3.5, "good"),
+        (2, 1, 1, date(2020, 2, 5), 4.25, "poor"),
+    ]
+    climate_db(fake_db, first)
+    assert app.archive_year(2020) == 2
+
+    assert app.archived_years() == [2020]
+    assert app.load_archived_rows() == first
+
+    # Same id on another date is a different reading when partitioned;
+    # same (id, date) replaces the archived copy
+    second = [
+        (1, 1, 1, date(2020, 3, 5), 7.0, "excellent"),
+        (2, 1, 1, date(2020, 2, 5), 5.0, "good"),
+    ]
+    climate_db(fake_db, second)
+    app._read_archive_file.cache_clear()
+    assert app.archive_year(2020) == 2
+
+    assert app.load_archived_rows() == [first[0], second[1], second[0]]
+    assert app.load_archived_rows(date(2020, 2, 1), date(2020, 2, 28)) == [second[1]]
+    assert app.load_archived_rows(date(2021, 1, 1)) == []
+
+
+def test_archive_deletes_rows_when_unpartitioned(archive_dir, fake_db, monkeypatch):
+    monkeypatch.setattr(app, "CLIMATE_PARTITIONING", "none")
+    conn = climate_db(fake_db, [(7, 1, 1, date(2020, 6, 1), 1.0, "good")])
+    app.archive_year(2020)
+
+    sql, params = conn.statements[-1]
+    assert sql.startswith("DELETE FROM climate_data")
+    assert params == (date(2020, 1, 1), date(2021, 1, 1), 7)
+
+
+def test_archive_truncates_the_years_partitions(archive_dir, fake_db, monkeypatch):
+    monkeypatch.setattr(app, "CLIMATE_PARTITIONING", "monthly")
+    months = [f"p2020_{m:02d}" for m in range(1, 13)]
+    conn   = climate_db(fake_db, [(7, 1, 1, date(2020, 6, 1), 1.0, "good")], ["p_old", *months, "p_max"])
+    app.archive_year(2020)
+
+    sql, _ = conn.statements[-1]
+    assert sql == f"ALTER TABLE climate_data TRUNCATE PARTITION {', '.join(months)};"
+
+
+def test_archive_falls_back_to_delete_when_the_year_is_in_p_old(archive_dir, fake_db, monkeypatch):
+    monkeypatch.setattr(app, "CLIMATE_PARTITIONING", "yearly")
+    conn = climate_db(fake_db, [(7, 1, 1, date(2020, 6, 1), 1.0, "good")], ["p_old", "p2022", "p_max"])
+    app.archive_year(2020)
+
+    sql, _ = conn.statements[-1]
+    assert sql.startswith("DELETE FROM climate_data")
+
+
+def test_archived_rows_match_names_case_insensitively(fake_db, monkeypatch):
+    archived = [(1, 1, 1, date(2020, 1, 5), 3.5, "good"), (2, 2, 1, date(2020, 1, 5), 9.0, "good")]
+    monkeypatch.setattr(app, "load_archived_rows", lambda start, end: archived)
+    fake_db(results=[
+        ("FROM locations", [
+            {"id": 1, "name": "London", "region": "England", "country": "UK"},
+            {"id": 2, "name": "Tokyo", "region": "Kanto", "country": "Japan"},
+        ]),
+        ("FROM metrics", [{"id": 1, "name": "temperature", "unit": "celsius"}]),
+    ])
+
+    rows = app.read_archived_rows(location_name="london", metric_name="Temperature")
+    assert [r["id"] for r in rows] == [1]
+
+
+def test_archive_refuses_open_years(archive_dir):
+    with pytest.raises(ValueError):
+        app.archive_year(date.today().year)
+
+
+def test_ingest_rejects_ids_when_partitioned(monkeypatch):
+    monkeypatch.setattr(app, "CLIMATE_PARTITIONING", "yearly")
+    entry = {"id": 5, "location_id": 1, "metric_id": 1, "date": "2025-01-01", "value": 1.0, "quality": "good"}
+    row, err = app.validate_reading(entry, {1}, {1})
+    assert row is None
+    assert "partitioned" in err
+
+    del entry["id"]
+    row, err = app.validate_reading(entry, {1}, {1})
+    assert err is None
@@ -0,0 +1,154 @@
+import math
+import random
+import statistics
+from datetime import date
+
+import pytest
+
+import app
+
+
+def pearson_reference(a, b, lag):
+    """Straightforward pairwise-complete Pearson r of a[t] against b[t + lag]."""
+    pairs = [
+        (a[t], b[t + lag]) for t in range(len(a))
+        if 0 <= t + lag < len(b) and a[t] is not None and b[t + lag] is not None
+    ]
+    if len(pairs) < app.COMPARE_MIN_OVERLAP:
+        return None, len(pairs)
+    xs, ys = zip(*pairs)
+    if len(set(xs)) < 2 or len(set(ys)) < 2:
+        return None, len(pairs)
+    return statistics.correlation(xs, ys), len(pairs)
+
+
+def test_lag_sign_follows_the_leading_series():
+    rng = random.Random(5)
+    a   = [rng.gauss(0, 1) for _ in range(60)]
+    b   = [0.0, 0.0] + a[:-2]          # b repeats a two steps later
+    result = app.lagged_correlations([a, b], 3)
+
+    assert result[(0, 1, 2)][0] == pytest.approx(1.0)
+    assert result[(0, 1, 2)][1] == 58
+    best = max(range(-3, 4), key=lambda lag: abs(result[(0, 1, lag)][0]))
+    assert best == 2
+
+
+def test_negative_lags_mirror_the_reversed_pair():
+    rng = random.Random(9)
+    a   = [rng.gauss(0, 1) for _ in range(40)]
+    b   = a[3:] + [None, None, None]   # b leads a by three steps
+    result = app.lagged_correlations([a, b], 4)
+
+    assert result[(0, 1, -3)][0] == pytest.approx(1.0)
+    assert result[(0, 1, -3)][1] == 37
+
+
+def test_matches_reference_with_gaps_and_flat_rows():
+    rng    = random.Random(21)
+    matrix = [
+        [rng.gauss(0, 1) if rng.random() > 0.3 else None for _ in range(50)]
+        for _ in range(4)
+    ]
+    matrix.append([2.0] * 50)                                   # flat: never correlates
+    matrix.append([None] * 48 + [1.0, 2.0])                     # too little overlap
+    result = app.lagged_correlations(matrix, 5)
+
+    for i in range(len(matrix)):
+        for j in range(i + 1, len(matrix)):
+            for lag in range(-5, 6):
+                expected, n = pearson_reference(matrix[i], matrix[j], lag)
+                r, overlap  = result[(i, j, lag)]
+                assert overlap == n
+                if expected is None:
+                    assert r is None
+                else:
+                    assert r == pytest.approx(expected, abs=1e-9)
+
+
+def test_gram_path_for_gap_free_rows_matches_reference():
+    rng    = random.Random(4)
+    matrix = [[rng.gauss(0, 1) for _ in range(30)] for _ in range(4)]
+    matrix.append([1.5] * 30)                                   # flat
+    matrix.append([rng.gauss(0, 1) if t % 5 else None for t in range(30)])
+    result = app.lagged_correlations(matrix, 2)
+
+    for i in range(len(matrix)):
+        for j in range(i + 1, len(matrix)):
+            for lag in range(-2, 3):
+                expected, n = pearson_reference(matrix[i], matrix[j], lag)
+                r, overlap  = result[(i, j, lag)]
+                assert overlap == n
+                assert (r is None) == (expected is None)
+                if expected is not None:
+                    assert r == pytest.approx(expected, abs=1e-9)
+
+
+def test_correlation_work_counts_gappy_pairs_as_dearer():
+    dense  = [[1.0, 2.0, 3.0, 4.0]] * 3
+    gappy  = [[1.0, None, 3.0, 4.0]] * 3
+    assert app.correlation_work(dense, 0) == 3 * 4               # one pass per pair
+    assert app.correlation_work(gappy, 0) == 3 * 6 * 4           # six passes per pair
+    assert app.correlation_work(dense, 1) == 3 * 4 + 6 * 3       # plus both directions at lag 1
+
+
+def test_lags_beyond_the_grid_have_no_overlap():
+    result = app.lagged_correlations([[1.0, 2.0, 3.0], [3.0, 1.0, 2.0]], 5)
+    assert result[(0, 1, 5)] == (None, 0)
+    assert result[(0, 1, -4)] == (None, 0)
+
+
+def test_grid_dates_and_buckets_agree():
+    grid = app.grid_dates(date(2024, 11, 1), date(2025, 2, 1), "month")
+    assert grid == [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)]
+    assert app.grid_bucket(date(2024, 12, 19), "month") == date(2024, 12, 1)
+    assert app.grid_bucket(date(2024, 12, 19), "week") == date(2024, 12, 16)   # a Monday
+
+
+def test_compare_rejects_max_lag_above_the_cap():
+    client = app.app.test_client()
+    resp   = client.get(f"/api/v1/compare?metrics=temperature&max_lag={app.COMPARE_MAX_LAG + 1}")
+    assert resp.status_code == 400
+    assert "max_lag" in resp.get_json()["error"]
+
+
+@pytest.fixture
+def compare_db(fake_db, monkeypatch):
+    """Two stations with monthly temperatures, nothing archived."""
+    monkeypatch.setattr(app, "location_index", app.LocationIndex())
+    monkeypatch.setattr(app, "load_archived_rows", lambda start=None, end=None: [])
+
+    def install():
+        cells = [
+            {"location_id": loc_id, "metric_id": 1, "bucket": f"2024-{m:02d}-01",
+             "weighted_sum": (m * loc_id + m % 2) * 0.8, "weight_total": 0.8}
+            for loc_id in (1, 2) for m in range(1, 7)
+        ]
+        return fake_db(results=[
+            ("FROM locations", [
+                {"id": 1, "name": "London", "country": "UK", "latitude": 51.5, "longitude": -0.1, "region": "England"},
+                {"id": 2, "name": "Tokyo", "country": "Japan", "latitude": 35.7, "longitude": 139.7, "region": "Kanto"},
+            ]),
+            ("FROM metrics", [{"id": 1, "name": "temperature", "unit": "celsius"}]),
+            ("FROM climate_data", cells),
+        ])
+    return install
+
+
+def test_compare_matches_metric_names_case_insensitively(compare_db):
+    compare_db()
+    resp = app.app.test_client().get("/api/v1/compare?locations=london,Tokyo&metrics=Temperature")
+    assert resp.status_code == 200
+    assert resp.get_json()["data"]["correlation"]["labels"] == ["London:temperature", "Tokyo:temperature"]
+
+    resp = app.app.test_client().get("/api/v1/compare?locations=London&metrics=Temperature,rainfall")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "unknown metric: rainfall"
+
+
+def test_compare_refuses_work_above_the_budget(compare_db, monkeypatch):
+    compare_db()
+    monkeypatch.setattr(app, "COMPARE_MAX_WORK", 5)
+    resp = app.app.test_client().get("/api/v1/compare?locations=London,Tokyo&metrics=temperature")
+    assert resp.status_code == 400
+    assert "too large" in resp.get_json()["error"]
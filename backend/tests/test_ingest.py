@@ -0,0 +1,155 @@
+from datetime import date
+
+import mysql.connector
+import pytest
+
+import app
+
+
+def out_of_range(*bad_values, error=None, after=0):
+    """
+    executemany() failure hook: `error` once `after` rows are committed,
+    otherwise a DataError for any batch holding one of `bad_values`.
+    """
+    def check(conn, rows):
+        if error is not None and len(conn.committed) >= after:
+            return error
+        bad = [row for row in rows if row[4] in bad_values]
+        if bad:
+            return mysql.connector.errors.DataError(msg=f"Out of range value {bad[0][4]}")
+        return None
+    return check
+
+
+def reading(value, day=1, location_id=1):
+    return (None, location_id, 1, date(2025, 1, day), value, "good")
+
+
+@pytest.fixture
+def buffer():
+    # A long interval keeps the background worker from flushing mid-test
+    return app.IngestBuffer(flush_size=1000, flush_interval=3600, max_pending=10, max_dead_letters=5)
+
+
+def test_flush_bisects_and_dead_letters_bad_rows(fake_db, buffer):
+    conn = fake_db(error=out_of_range(-999.0))
+    flushed = []
+    buffer._on_flush = flushed.extend
+
+    rows = [reading(1.0, 1), reading(-999.0, 2), reading(3.0, 3), reading(4.0, 4)]
+    buffer.add(rows)
+
+    assert buffer.flush() == 3
+    assert conn.committed == [rows[0], rows[2], rows[3]]
+    assert flushed == conn.committed
+    assert buffer.pending() == 0
+    assert [entry["row"] for entry in buffer.dead_letters] == [rows[1]]
+    assert "Out of range" in buffer.dead_letters[0]["error"]
+
+
+def test_flush_requeues_on_connection_errors(fake_db, buffer):
+    conn = fake_db(error=mysql.connector.errors.OperationalError(msg="server has gone away"))
+    rows = [reading(1.0, 1), reading(2.0, 2)]
+    buffer.add(rows)
+
+    with pytest.raises(mysql.connector.errors.OperationalError):
+        buffer.flush()
+    assert buffer.pending() == 2
+    assert len(conn.attempts) == 1        # no bisecting on server errors
+    assert not buffer.dead_letters
+
+    conn.error = None
+    assert buffer.flush() == 2
+    assert conn.committed == rows
+
+
+def test_flush_requeues_only_rows_not_yet_committed(fake_db, buffer):
+    # The bad row splits the batch; the second half then loses the connection
+    conn = fake_db(error=out_of_range(
+        -999.0, error=mysql.connector.errors.OperationalError(msg="lost connection"), after=2
+    ))
+    flushed = []
+    buffer._on_flush = flushed.extend
+
+    rows = [reading(1.0, 1), reading(2.0, 2), reading(-999.0, 3), reading(4.0, 4)]
+    buffer.add(rows)
+
+    with pytest.raises(mysql.connector.errors.OperationalError):
+        buffer.flush()
+    assert conn.committed == rows[:2]
+    assert flushed == rows[:2]
+    assert buffer.pending() == 2
+
+    conn.error = out_of_range(-999.0)
+    assert buffer.flush() == 1
+    assert conn.committed == [rows[0], rows[1], rows[3]]
+    assert [entry["row"] for entry in buffer.dead_letters] == [rows[2]]
+
+
+def test_ingest_returns_503_when_the_automatic_flush_fails(fake_db, monkeypatch):
+    conn = fake_db(
+        results=[("FROM locations", [(1,)]), ("FROM metrics", [(1,)])],
+        error=mysql.connector.errors.OperationalError(msg="server has gone away")
+    )
+    monkeypatch.setattr(app, "ingest_buffer", app.IngestBuffer(flush_size=1, flush_interval=3600))
+
+    resp = app.app.test_client().post("/api/v1/ingest", json=[
+        {"location_id": 1, "metric_id": 1, "date": "2025-01-01", "value": 1.0, "quality": "good"}
+    ])
+    assert resp.status_code == 503
+    assert "buffered but flush failed" in resp.get_json()["error"]
+    assert app.ingest_buffer.pending() == 1
+
+    conn.error = None
+    assert app.ingest_buffer.flush() == 1
+    assert len(conn.committed) == 1
+
+
+def test_add_refuses_rows_over_max_pending(buffer):
+    buffer.add([reading(float(i), i + 1) for i in range(8)])
+
+    with pytest.raises(app.IngestBufferFull):
+        buffer.add([reading(9.0, 9), reading(10.0, 10), reading(11.0, 11)])
+    assert buffer.pending() == 8          # nothing from the refused batch is kept
+
+    assert buffer.add([reading(9.0, 9), reading(10.0, 10)]) == 10
+
+
+def test_dead_letters_are_bounded(fake_db, buffer):
+    fake_db(error=out_of_range(*(float(i) for i in range(8))))
+    buffer.add([reading(float(i), i + 1) for i in range(8)])
+
+    assert buffer.flush() == 0
+    assert [entry["row"][4] for entry in buffer.dead_letters] == [3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+@pytest.mark.parametrize("entry, message", [
+    ({"id": 2**31}, "id must be"),
+    ({"id": 0}, "id must be"),
+    ({"date": "0999-12-31"}, "1000-01-01"),
+    ({"value": 1e300}, "value must be"),
+    ({"value": float("nan")}, "value must be"),
+])
+def test_validate_reading_rejects_values_mysql_cannot_store(entry, message):
+    base = {"location_id": 1, "metric_id": 1, "date": "2025-01-01", "value": 1.0, "quality": "good"}
+    row, err = app.validate_reading({**base, **entry}, {1}, {1})
+    assert row is None
+    assert message in err
+
+
+def test_validate_reading_accepts_column_limits():
+    row, err = app.validate_reading({
+        "id": 2**31 - 1, "location_id": 1, "metric_id": 1,
+        "date": "1000-01-01", "value": -3.4e38, "quality": "Good"
+    }, {1}, {1})
+    assert err is None
+    assert row == (2**31 - 1, 1, 1, date(1000, 1, 1), -3.4e38, "good")
+
+
+def test_summarize_flushed_rows_groups_by_series():
+    rows = [reading(1.0, 3), reading(2.0, 1), reading(3.0, 2, location_id=2)]
+    summary = sorted(app.summarize_flushed_rows(rows), key=lambda s: s["location_id"])
+    assert summary == [
+        {"location_id": 1, "metric_id": 1, "start_date": "2025-01-01", "end_date": "2025-01-03", "count": 2},
+        {"location_id": 2, "metric_id": 1, "start_date": "2025-01-02", "end_date": "2025-01-02", "count": 1},
+    ]
@@ -0,0 +1,115 @@
+import math
+import random
+from datetime import date
+
+import pytest
+
+import app
+
+
+def make_locations(count, seed=11):
+    rng = random.Random(seed)
+    return [
+        {
+            "id":        i,
+            "name":      f"station-{i}",
+            "country":   rng.choice(["USA", "UK", "Japan"]),
+            "latitude":  rng.uniform(-90, 90),
+            "longitude": rng.uniform(-180, 180),
+            "region":    rng.choice(["North", "South"]),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * app.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def index(fake_db):
+    fake_db(results=[("FROM locations", make_locations(300))])
+    idx = app.LocationIndex()
+    idx._ensure_loaded()
+    return idx
+
+
+QUERIES = [(0.0, 0.0), (51.5, -0.1), (-33.9, 151.2), (89.9, 45.0), (10.0, 179.9), (-10.0, -179.9)]
+
+
+@pytest.mark.parametrize("lat, lon", QUERIES)
+def test_nearest_matches_brute_force(index, lat, lon):
+    expected = sorted(index.locations.values(),
+                      key=lambda loc: haversine_km(lat, lon, loc["latitude"], loc["longitude"]))
+    found = index.nearest(lat, lon, k=7)
+
+    assert [loc["id"] for loc, _ in found] == [loc["id"] for loc in expected[:7]]
+    for loc, dist in found:
+        assert dist == pytest.approx(haversine_km(lat, lon, loc["latitude"], loc["longitude"]), rel=1e-6)
+
+
+@pytest.mark.parametrize("lat, lon", QUERIES)
+@pytest.mark.parametrize("radius_km", [500, 2500])
+def test_within_radius_matches_brute_force(index, lat, lon, radius_km):
+    expected = {
+        loc["id"] for loc in index.locations.values()
+        if haversine_km(lat, lon, loc["latitude"], loc["longitude"]) <= radius_km
+    }
+    found = index.within_radius(lat, lon, radius_km)
+
+    assert {loc["id"] for loc, _ in found} == expected
+    assert [d for _, d in found] == sorted(d for _, d in found)
+
+
+@pytest.mark.parametrize("box", [
+    (-10, -20, 30, 40),
+    (40, 150, 70, -150),   # crosses the antimeridian
+])
+def test_within_bbox_matches_brute_force(index, box):
+    min_lat, min_lon, max_lat, max_lon = box
+
+    def inside(loc):
+        if not min_lat <= loc["latitude"] <= max_lat:
+            return False
+        if min_lon <= max_lon:
+            return min_lon <= loc["longitude"] <= max_lon
+        return loc["longitude"] >= min_lon or loc["longitude"] <= max_lon
+
+    found = index.within_bbox(*box)
+    assert {loc["id"] for loc in found} == {loc["id"] for loc in index.locations.values() if inside(loc)}
+
+
+def test_average_across_stations_weights_stations_not_readings():
+    day = date(2024, 1, 1)
+    points = [
+        {"date": day, "value": 10.0, "quality": "good", "location_id": 1},
+        {"date": day, "value": 12.0, "quality": "excellent", "location_id": 1},
+        {"date": day, "value": 20.0, "quality": "poor", "location_id": 2},
+        {"date": date(2024, 1, 2), "value": 5.0, "quality": "good", "location_id": 2},
+    ]
+    pooled = sorted(app.average_across_stations(points), key=lambda p: p["date"])
+
+    assert [(p["date"], p["value"], p["quality"]) for p in pooled] == [
+        (day, 15.5, "poor"),
+        (date(2024, 1, 2), 5.0, "good"),
+    ]
+
+
+def test_read_archived_rows_carries_location_columns_and_skips_unknown_ids(fake_db, monkeypatch):
+    archived = [
+        (1, 1, 1, date(2020, 1, 5), 3.5, "good"),
+        (2, 99, 1, date(2020, 1, 6), 4.5, "good"),   # location since deleted
+    ]
+    monkeypatch.setattr(app, "load_archived_rows", lambda start, end: archived)
+    fake_db(results=[
+        ("FROM locations", [{"id": 1, "name": "Irvine", "region": "West", "country": "USA"}]),
+        ("FROM metrics", [{"id": 1, "name": "temperature", "unit": "celsius"}]),
+    ])
+
+    rows = app.read_archived_rows()
+    assert len(rows) == 1
+    assert rows[0]["location_name"] == "Irvine"
+    assert (rows[0]["region"], rows[0]["country"]) == ("West", "USA")
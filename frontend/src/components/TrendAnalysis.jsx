@@ -81,12 +81,12 @@ function TrendAnalysis({ data, loading }) {
                       <span className="w-24">{anomaly.value}</span>
                       <span
                         className={`px-2 py-1 rounded text-xs ${
-                          anomaly.deviation > 3
+                          isSevere(anomaly)
                             ? 'bg-red-100 text-red-800'
                             : 'bg-yellow-100 text-yellow-800'
                         }`}
                       >
-                        {anomaly.deviation.toFixed(1)} σ
+                        {formatDeviation(anomaly)}
                       </span>
                     </div>
                   ))}
@@ -173,4 +173,20 @@ function getTrendIcon(direction) {
   }
 }
 
+// `global` anomalies carry a z-score (`deviation`, flagged above 2σ);
+// `seasonal`/`rolling` ones carry a median/MAD score (`robust_z`, flagged above 3.5)
+function isSevere(anomaly) {
+  if (anomaly.robust_z !== undefined) {
+    return Math.abs(anomaly.robust_z) > 5;
+  }
+  return Math.abs(anomaly.deviation) > 3;
+}
+
+function formatDeviation(anomaly) {
+  if (anomaly.robust_z !== undefined) {
+    return `${anomaly.robust_z.toFixed(1)} robust z`;
+  }
+  return `${anomaly.deviation.toFixed(1)} σ`;
+}
+
 export default TrendAnalysis;